@@ -7,11 +7,38 @@ import logging
 load_dotenv(find_dotenv(usecwd=True) or Path(__file__).resolve().parents[2] / '.env')
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Gemini REST base (override to point Stage 1/2 at a local stand-in server)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 SHOTSTACK_API_KEY = os.getenv("SHOTSTACK_API_KEY")
-# Render backend selection: 'shotstack' (default) or 'local'
+# Render backend selection: 'shotstack' (default), 'local' (per-scene segments + concat)
+# or 'local_single_pass' (one ffmpeg filter_complex invocation for the whole timeline)
 RENDER_BACKEND = os.getenv("RENDER_BACKEND", "shotstack").lower().strip()
+# Local renderer: concurrent ffmpeg segment encodes (0 = auto, one per CPU core up to the scene count)
+RENDER_WORKERS = max(0, int(os.getenv("RENDER_WORKERS", "0")))
+# Render a 360p ultrafast proxy before the full-quality render and publish it as preview_url
+RENDER_PREVIEW = os.getenv("RENDER_PREVIEW", "").lower() in {"1", "true", "yes"}
+# Content-addressed cache of local render segments (0 bytes disables it)
+SEGMENT_CACHE_DIR = os.getenv("SEGMENT_CACHE_DIR", os.path.join("temp", "cache", "segments"))
+SEGMENT_CACHE_MAX_BYTES = max(0, int(os.getenv("SEGMENT_CACHE_MAX_BYTES", str(2 * 1024**3))))
+# Shared on-disk cache for remote clips downloaded by the local renderer
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join("temp", "cache", "downloads"))
+DOWNLOAD_CACHE_MAX_BYTES = max(0, int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(4 * 1024**3))))
+DOWNLOAD_WORKERS = max(1, int(os.getenv("DOWNLOAD_WORKERS", "4")))
+# Pre-rendered backgrounds for synthetic fallback clips (text is overlaid in the segment encode)
+SYNTHETIC_CACHE_DIR = os.getenv("SYNTHETIC_CACHE_DIR", os.path.join("temp", "cache", "synthetic"))
+SYNTHETIC_CACHE_MAX_BYTES = max(0, int(os.getenv("SYNTHETIC_CACHE_MAX_BYTES", str(100 * 1024**2))))
+# Resolution of the final render, used by Stage 3 to pick the smallest stock rendition that covers it.
+# Local renderers output 1280x720, Shotstack renders at "1080" (1920x1080). Override with e.g. "720x1280".
+_default_target = "1280x720" if RENDER_BACKEND in {"local", "local_single_pass"} else "1920x1080"
+try:
+    MEDIA_TARGET_WIDTH, MEDIA_TARGET_HEIGHT = (
+        int(v) for v in os.getenv("MEDIA_TARGET_RESOLUTION", _default_target).lower().split("x", 1)
+    )
+except ValueError:
+    logging.warning("Invalid MEDIA_TARGET_RESOLUTION - falling back to %s", _default_target)
+    MEDIA_TARGET_WIDTH, MEDIA_TARGET_HEIGHT = (int(v) for v in _default_target.split("x"))
 # Media source selection for Stage 3: 'pexels' (stock) or 'svd' (Stable Video Diffusion local server)
 MEDIA_SOURCE = os.getenv("MEDIA_SOURCE", "pexels").lower().strip()
 # TTS source selection: 'elevenlabs' (API) or 'local' (offline engine)
@@ -20,6 +47,46 @@ TTS_SOURCE = os.getenv("TTS_SOURCE", "elevenlabs").lower().strip()
 STABLE_VIDEO_SERVER_URL = os.getenv("STABLE_VIDEO_SERVER_URL", "http://127.0.0.1:7860")
 STABLE_VIDEO_POLL_INTERVAL = float(os.getenv("STABLE_VIDEO_POLL_INTERVAL", "3"))  # seconds
 STABLE_VIDEO_MAX_POLL = int(os.getenv("STABLE_VIDEO_MAX_POLL", "40"))  # ~2 minutes default
+# SVD jobs are submitted up front and tracked by one poller: per-job time budget (defaults to the
+# old poll budget), backoff cap for status polling, optional URL the server POSTs completions to
+SVD_JOB_TIMEOUT = float(os.getenv("SVD_JOB_TIMEOUT", str(STABLE_VIDEO_POLL_INTERVAL * STABLE_VIDEO_MAX_POLL)))
+SVD_POLL_MAX_INTERVAL = float(os.getenv("SVD_POLL_MAX_INTERVAL", "15"))
+SVD_CALLBACK_URL = os.getenv("SVD_CALLBACK_URL", "").strip()
+# Stage 3 concurrency: worker threads for per-scene video/TTS fetches (1 = sequential) and per-provider caps
+STAGE3_WORKERS = max(1, int(os.getenv("STAGE3_WORKERS", "4")))
+PEXELS_MAX_CONCURRENCY = max(1, int(os.getenv("PEXELS_MAX_CONCURRENCY", "3")))
+ELEVENLABS_MAX_CONCURRENCY = max(1, int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "2")))
+SVD_MAX_CONCURRENCY = max(1, int(os.getenv("SVD_MAX_CONCURRENCY", "2")))
+# On-disk Pexels search cache (query -> candidate list): TTL in seconds and byte quota
+PEXELS_SEARCH_CACHE_DIR = os.getenv("PEXELS_SEARCH_CACHE_DIR", os.path.join("temp", "cache", "pexels_search"))
+PEXELS_SEARCH_CACHE_TTL = float(os.getenv("PEXELS_SEARCH_CACHE_TTL", str(24 * 3600)))
+PEXELS_SEARCH_CACHE_MAX_BYTES = max(0, int(os.getenv("PEXELS_SEARCH_CACHE_MAX_BYTES", str(50 * 1024**2))))
+# Stage 1 idea cache keyed by normalized niche + model + prompt version: TTL in seconds and byte quota
+IDEA_CACHE_DIR = os.getenv("IDEA_CACHE_DIR", os.path.join("temp", "cache", "ideas"))
+IDEA_CACHE_TTL = float(os.getenv("IDEA_CACHE_TTL", str(6 * 3600)))
+IDEA_CACHE_MAX_BYTES = max(0, int(os.getenv("IDEA_CACHE_MAX_BYTES", str(10 * 1024**2))))
+# Pipeline: stream the Stage 2 script and start Stage 3 fetches for each scene as it arrives
+SCRIPT_STREAMING = os.getenv("SCRIPT_STREAMING", "").lower() in {"1", "true", "yes"}
+# Pipeline: generate the idea and the script with one Gemini call instead of two
+FUSED_IDEA_SCRIPT = os.getenv("FUSED_IDEA_SCRIPT", "").lower() in {"1", "true", "yes"}
+# generate_video_ideas: niches packed into one Gemini request
+IDEA_BATCH_SIZE = max(1, int(os.getenv("IDEA_BATCH_SIZE", "20")))
+# POST /pipeline/suggest: in-memory trending pool refreshed in the background (stale-while-revalidate)
+SUGGEST_POOL_SIZE = max(3, int(os.getenv("SUGGEST_POOL_SIZE", "8")))
+SUGGEST_REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", str(30 * 60)))
+SUGGEST_RETRY_INTERVAL = float(os.getenv("SUGGEST_RETRY_INTERVAL", "60"))
+# ElevenLabs API base (override to point at a local stand-in server) and whole-script batched TTS
+ELEVENLABS_API_BASE = os.getenv("ELEVENLABS_API_BASE", "https://api.elevenlabs.io").rstrip("/")
+TTS_BATCH = os.getenv("TTS_BATCH", "").lower() in {"1", "true", "yes"}
+# Content-addressed TTS audio cache keyed by text + voice parameters (0 bytes disables it)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("temp", "cache", "tts"))
+TTS_CACHE_MAX_BYTES = max(0, int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024**2))))
+# Background job queue for POST /pipeline: worker pool size, max queued jobs, SQLite job store path
+PIPELINE_WORKERS = max(1, int(os.getenv("PIPELINE_WORKERS", "2")))
+PIPELINE_MAX_PENDING = max(1, int(os.getenv("PIPELINE_MAX_PENDING", "20")))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("temp", "jobs.db"))
+# Per-run stage checkpoints (idea/script/assets/render) used by resume()
+RUNS_DIR = os.getenv("AUTOVIDAI_RUNS_DIR", os.path.join("temp", "runs"))
 # Use 'v1' for production, 'stage' for Shotstack staging environments
 _raw_stage = os.getenv("SHOTSTACK_STAGE", "v1").lower().strip()
 if _raw_stage in {"stage", "staging", "sandbox", "dev"}:
@@ -33,7 +100,7 @@ else:
 # Dev mode allows running without real keys; stages will provide fallbacks.
 AUTOVIDAI_DEV_MODE = 0
 
-if not AUTOVIDAI_DEV_MODE and RENDER_BACKEND != "local":
+if not AUTOVIDAI_DEV_MODE and RENDER_BACKEND not in {"local", "local_single_pass"}:
     # In non-dev mode, enforce presence of all keys unless using local renderer (which bypasses Shotstack and can run w/o SHOTSTACK key).
     if not all([GEMINI_API_KEY, PEXELS_API_KEY, ELEVENLABS_API_KEY, SHOTSTACK_API_KEY]):
         raise ValueError("One or more API keys are missing. Please check your .env file or enable AUTOVIDAI_DEV_MODE or set RENDER_BACKEND=local.")
@@ -7,10 +7,16 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import List, Dict
 
-from app.services.pipeline_runner import run_pipeline
+from app.services.job_queue import QueueFullError, get_job_queue
+from app.services.pipeline_runner import resume as resume_pipeline
+from app.services import run_artifacts
+from app.services.file_cache import cache_stats
+from app.services.svd_client import get_svd_client
+from app.services import toolchain
+from app.services.trending_pool import get_trending_pool
 from app.stages.stage_1_idea_engine import (
     suggest_niche_via_model,
-    suggest_trending_niches,
+    generate_video_ideas,
     generate_video_idea,
 )
 from app.stages.stage_2_scriptwriter import build_script_prompt, run_scriptwriter
@@ -40,9 +46,10 @@ class PipelineRequest(BaseModel):
     niche: str
     upload: bool = False
     verbose: bool = False
+    fresh: bool = False  # bypass the Stage 1 idea cache and ask the model for a new idea
 
 class PipelineResponse(BaseModel):
-    job_id: str | None = None  # placeholder for future queue integration
+    job_id: str | None = None  # poll GET /jobs/{job_id} for progress and the final result
     stage: str | None
     final_video_url: str | None
     script: Dict | None = None
@@ -52,6 +59,31 @@ class PipelineResponse(BaseModel):
     error: str | None
 
 
+class ResumeRequest(BaseModel):
+    from_stage: str | None = None  # idea | script | assets | render | upload; default: first missing checkpoint
+    upload: bool | None = None  # default: same as the original run
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    niche: str | None = None
+    upload: bool = False
+    status: str  # queued | running | done | failed
+    stage: str | None = None  # current result["stage"] of the pipeline
+    created_at: float | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+    timings: Dict | None = None  # seconds spent per stage
+    final_video_url: str | None = None
+    preview_url: str | None = None  # /files URL of the 360p proxy (RENDER_PREVIEW), set while rendering
+    result: Dict | None = None
+    error: str | None = None
+
+
+class JobListResponse(BaseModel):
+    jobs: list[JobResponse]
+
+
 class Stage2PromptRequest(BaseModel):
     """Request to build a default Stage 2 prompt.
 
@@ -61,6 +93,16 @@ class Stage2PromptRequest(BaseModel):
 
     niche: str | None = None
     idea: Dict | None = None
+    fresh: bool = False  # bypass the Stage 1 idea cache when generating from a niche
+
+
+class IdeasBatchRequest(BaseModel):
+    niches: list[str]
+    fresh: bool = False  # bypass the idea cache for every niche
+
+
+class IdeasBatchResponse(BaseModel):
+    ideas: list[Dict]  # one idea per requested niche, in request order
 
 
 class Stage2PromptResponse(BaseModel):
@@ -95,6 +137,10 @@ app.add_middleware(
 @app.on_event("startup")
 def startup():
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Probe ffmpeg/ffprobe capabilities once so stages never pay for it mid-render.
+    toolchain.probe()
+    # Warm the trending topics pool so the first /pipeline/suggest is served from memory.
+    get_trending_pool().refresh_if_stale()
 
 @app.get("/health")
 def health():
@@ -208,9 +254,41 @@ def health_deps(live: bool = Query(False, description="Perform non-destructive l
             shotstack.update(ok=True, message="Key present")
     result["shotstack"] = shotstack
 
+    # Local media toolchain (probed once at startup; refreshed on live checks)
+    tools = toolchain.probe(refresh=live)
+    result["toolchain"] = {
+        "ok": tools["ffmpeg"]["ok"] and tools["ffprobe"]["ok"],
+        "message": "ffmpeg + ffprobe found" if tools["ffmpeg"]["ok"] and tools["ffprobe"]["ok"] else "ffmpeg/ffprobe missing from PATH",
+        **tools,
+    }
+
     return result
 
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters, hit rate and disk usage of the local caches (e.g. render segments).
+
+    Also reports the age and refresh counters of the /pipeline/suggest trending pool.
+    """
+    return {"caches": cache_stats(), "trending_pool": get_trending_pool().stats()}
+
+
+@app.post("/svd/callback")
+def svd_callback(payload: Dict, token: str = Query("", description="Per-job token issued in callback_url")):
+    """Completion webhook for the Stable Video Diffusion server (enabled via SVD_CALLBACK_URL).
+
+    Only accepted with the token issued for that job and a clip URL on STABLE_VIDEO_SERVER_URL.
+    """
+    job_id = payload.get("id") or payload.get("job_id")
+    if not job_id:
+        raise HTTPException(status_code=400, detail="Missing job id")
+    try:
+        return {"accepted": get_svd_client().complete(job_id, payload, token)}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+
 @app.get("/providers/gemini/models")
 def gemini_models():
     """Return the list of model names available to the configured GEMINI_API_KEY."""
@@ -307,25 +385,135 @@ def shotstack_deep(poll: bool = Query(False, description="Poll render status onc
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Shotstack deep health failed: {e}")
 
-@app.post("/pipeline", response_model=PipelineResponse)
+def _files_url(path: str | None) -> str | None:
+    """Map a file under temp/render_local to its /files URL (remote URLs pass through)."""
+    if not path or path.startswith(("http://", "https://", "/files/")):
+        return path
+    base_dir = os.path.abspath(os.path.join("temp", "render_local"))
+    rel = os.path.relpath(os.path.abspath(path), base_dir)
+    if rel.startswith(".."):
+        return None
+    return "/files/" + rel.replace(os.sep, "/")
+
+
+def _job_response(job: dict, include_result: bool = True) -> JobResponse:
+    result = job.get("result") or {}
+    return JobResponse(
+        job_id=job["id"],
+        niche=job.get("niche"),
+        upload=job.get("upload", False),
+        status=job.get("status"),
+        stage=job.get("stage"),
+        created_at=job.get("created_at"),
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        timings=job.get("timings"),
+        final_video_url=result.get("final_video_url"),
+        preview_url=_files_url(result.get("preview_url")),
+        result=result if include_result and result else None,
+        error=job.get("error"),
+    )
+
+
+@app.post("/pipeline", response_model=PipelineResponse, status_code=202)
 def pipeline(req: PipelineRequest):
+    """Queue a pipeline run and return immediately with its job_id.
+
+    Progress and the final output are available from GET /jobs/{job_id}.
+    """
     if req.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
-    result = run_pipeline(req.niche, upload=req.upload)
-    if result.get("error"):
-        raise HTTPException(status_code=500, detail=result["error"])
+    try:
+        job = get_job_queue().submit(req.niche, upload=req.upload, fresh_idea=req.fresh)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return PipelineResponse(
-        job_id=None,
-        stage=result.get("stage"),
-        final_video_url=result.get("final_video_url"),
-        script=result.get("script"),
-        prompt=result.get("prompt"),
-        assets=result.get("assets"),
-        uploaded=result.get("uploaded", False),
-        error=result.get("error"),
+        job_id=job["id"],
+        stage=job.get("stage") or "queued",
+        final_video_url=None,
+        uploaded=False,
+        error=None,
+    )
+
+
+@app.get("/jobs", response_model=JobListResponse)
+def list_jobs(
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of jobs to return (newest first)"),
+    status: str | None = Query(None, description="Filter by status: queued, running, done or failed"),
+):
+    """List recent pipeline jobs without their full result payloads."""
+    jobs = get_job_queue().list(limit=limit, status=status)
+    return JobListResponse(jobs=[_job_response(j, include_result=False) for j in jobs])
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Report the current stage, per-stage timings and (once finished) the pipeline result."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str):
+    """Describe a run's checkpoints (which stages can be skipped on resume)."""
+    try:
+        meta = run_artifacts.load_meta(run_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {**meta, "completed_stages": run_artifacts.completed_stages(run_id)}
+
+
+@app.post("/runs/{run_id}/resume", response_model=PipelineResponse, status_code=202)
+def resume_run(run_id: str, req: ResumeRequest | None = None):
+    """Queue a resume of a previous run from its failed (or a chosen) stage.
+
+    Earlier stages are reloaded from checkpoints, so their provider calls are not repeated.
+    """
+    req = req or ResumeRequest()
+    if req.from_stage is not None and req.from_stage not in run_artifacts.STAGES:
+        raise HTTPException(status_code=400, detail=f"from_stage must be one of {run_artifacts.STAGES}")
+    try:
+        meta = run_artifacts.load_meta(run_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    upload = meta.get("upload", False) if req.upload is None else req.upload
+    try:
+        job = get_job_queue().submit(
+            meta.get("niche"),
+            upload=upload,
+            runner=lambda cb: resume_pipeline(run_id, from_stage=req.from_stage, upload=req.upload, on_update=cb),
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return PipelineResponse(
+        job_id=job["id"],
+        stage=job.get("stage") or "queued",
+        final_video_url=None,
+        uploaded=False,
+        error=None,
     )
 
 
+@app.post("/ideas/batch", response_model=IdeasBatchResponse)
+def ideas_batch(req: IdeasBatchRequest):
+    """Generate Stage 1 ideas for many niches with batched Gemini requests.
+
+    Ideas land in the idea cache, so queuing /pipeline for these niches afterwards skips
+    the per-run Stage 1 model call.
+    """
+    if not req.niches:
+        raise HTTPException(status_code=400, detail="niches must not be empty")
+    if len(req.niches) > 200:
+        raise HTTPException(status_code=400, detail="At most 200 niches per request")
+    return IdeasBatchResponse(ideas=generate_video_ideas(req.niches, fresh=req.fresh))
+
+
 @app.post("/stage2/prompt", response_model=Stage2PromptResponse)
 def stage2_prompt(req: Stage2PromptRequest):
     """Build and return the default Stage 2 prompt (and idea).
@@ -338,7 +526,7 @@ def stage2_prompt(req: Stage2PromptRequest):
     else:
         if not req.niche:
             raise HTTPException(status_code=400, detail="Either niche or idea must be provided")
-        idea = generate_video_idea(req.niche)
+        idea = generate_video_idea(req.niche, fresh=req.fresh)
         if isinstance(idea, dict) and idea.get("error"):
             raise HTTPException(status_code=500, detail=f"Stage 1 failed: {idea['error']}")
 
@@ -358,9 +546,9 @@ def stage2_run(req: Stage2RunRequest):
         )
     return Stage2RunResponse(script=script)
 
-@app.get("/files/{filename}")
+@app.get("/files/{filename:path}")
 def get_file(filename: str):
-    """Serve files from temp/render_local for local render backend.
+    """Serve files from temp/render_local (and its previews/ folder) for local render backend.
 
     Security: restrict to that directory only; no path traversal.
     """
@@ -395,6 +583,7 @@ def list_library_videos() -> Dict[str, List[Dict]]:
                     "size": stat.st_size,
                     "mtime": stat.st_mtime,
                     "url": f"/files/{name}",
+                    "preview_url": f"/files/previews/{name}" if os.path.exists(os.path.join(base_dir, "previews", name)) else None,
                 })
             except Exception:
                 continue
@@ -416,6 +605,9 @@ def delete_library_video(filename: str):
         raise HTTPException(status_code=404, detail="File not found")
     try:
         os.remove(safe_path)
+        preview_path = os.path.join(base_dir, "previews", os.path.basename(safe_path))
+        if os.path.exists(preview_path):
+            os.remove(preview_path)
         return {"ok": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -425,9 +617,10 @@ def delete_library_video(filename: str):
 def suggest(count: int = Query(5, ge=3, le=8, description="Number of topics to suggest (3-8)")):
     """Return multiple suggested trending topics (3-5 default) generated by the model.
 
-    Backward compatible: includes 'niche' as the first element.
+    Topics come from an in-memory pool refreshed in the background, so the model is never
+    called on the request path. Backward compatible: includes 'niche' as the first element.
     """
-    topics = suggest_trending_niches(count)
+    topics = get_trending_pool().get(count)
     if not topics:
         # Never fail the UX — provide deterministic stub list
         topics = [
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable
+
+# Every cache registers itself here so GET /cache/stats can report all of them.
+_REGISTRY: dict[str, Any] = {}
+
+
+class FileCache:
+    """Content-addressed on-disk file cache with a byte quota and LRU eviction.
+
+    Entries are plain files named <key><suffix> in `directory`. A hit refreshes the
+    file's mtime, and eviction removes the least recently used files once the total
+    size exceeds `max_bytes`. Writes go through a temp file + rename so readers never
+    observe partial entries, which also makes the cache safe to share across
+    concurrent runs and processes.
+    """
+
+    def __init__(self, name: str, directory: str, max_bytes: int, register: bool = True):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if register:
+            _REGISTRY[name] = self
+
+    def path_for(self, key: str, suffix: str = "") -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def lookup(self, key: str, suffix: str = "") -> str | None:
+        """Return the cached file path for key (refreshing its LRU position) or None."""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def store(self, key: str, src_path: str, suffix: str = "", move: bool = False) -> str | None:
+        """Copy (or move) src_path into the cache under key; returns the cached path or None."""
+        os.makedirs(self.directory, exist_ok=True)
+        dest = self.path_for(key, suffix)
+        tmp = f"{dest}.{uuid.uuid4().hex}.part"
+        try:
+            if move:
+                shutil.move(src_path, tmp)
+            else:
+                shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dest)
+        except Exception as e:
+            logging.warning("%s cache: could not store %s: %s", self.name, src_path, e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return None
+        self.evict()
+        return dest
+
+    def store_bytes(self, key: str, data: bytes, suffix: str = "") -> str | None:
+        """Write data into the cache under key; returns the cached path or None."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logging.warning("%s cache: could not write entry: %s", self.name, e)
+            return None
+        return self.store(key, tmp, suffix, move=True)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.directory):
+                    if name.endswith(".part"):
+                        continue
+                    path = os.path.join(self.directory, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+            except FileNotFoundError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self.evictions += 1
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        entries, size = 0, 0
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(".part"):
+                    continue
+                try:
+                    size += os.path.getsize(os.path.join(self.directory, name))
+                    entries += 1
+                except OSError:
+                    continue
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class JsonCache:
+    """TTL'd JSON values on disk (LRU-bounded by bytes) with single-flight fetching.
+
+    get_or_fetch() returns a fresh cached value when one exists; otherwise exactly one
+    caller runs `fetch` while concurrent callers asking for the same key wait for and
+    share its result. Exceptions from `fetch` propagate to every waiter and are never
+    cached, so transient provider errors don't poison the cache.
+    """
+
+    def __init__(self, name: str, directory: str, max_bytes: int, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._files = FileCache(name, directory, max_bytes, register=False)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.coalesced = 0
+        _REGISTRY[name] = self
+
+    def get(self, key: str):
+        """Return the cached value for key if present and younger than ttl, else None."""
+        path = self._files.lookup(key, ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl and time.time() - entry.get("stored_at", 0) > self.ttl:
+            with self._lock:
+                self.expired += 1
+            return None
+        return entry.get("value")
+
+    def put(self, key: str, value) -> None:
+        data = json.dumps({"stored_at": time.time(), "value": value}, default=str).encode("utf-8")
+        self._files.store_bytes(key, data, ".json")
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], fresh: bool = False):
+        """Return the cached value or fetch (coalescing concurrent identical requests).
+
+        fresh=True skips the cache read but still shares an in-flight fetch and stores its result.
+        """
+        if not fresh:
+            value = self.get(key)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+            if value is not None:
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        files = self._files.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expired": self.expired,
+                "coalesced": self.coalesced,
+                "evictions": files["evictions"],
+                "entries": files["entries"],
+                "bytes": files["bytes"],
+                "max_bytes": files["max_bytes"],
+                "ttl": self.ttl,
+            }
+
+
+def materialize(cached_path: str, dest: str, hardlink: bool = True) -> str:
+    """Place a cached file at dest via hardlink (cheap), falling back to a copy.
+
+    Handing out a per-run link means later LRU eviction of the cache entry cannot pull
+    the file out from under a render that is still using it. Pass hardlink=False when
+    other code may later rewrite dest in place, which would corrupt a linked entry.
+    """
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if hardlink:
+        try:
+            os.link(cached_path, dest)
+            return dest
+        except OSError:
+            pass
+    shutil.copyfile(cached_path, dest)
+    return dest
+
+
+_file_digests: dict[tuple, str] = {}
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content, memoized per (path, size, mtime) for the process lifetime."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _file_digests_lock:
+        cached = _file_digests.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _file_digests_lock:
+        _file_digests[memo_key] = digest
+    return digest
+
+
+def cache_stats() -> dict:
+    """Stats of every registered cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _REGISTRY.items()}
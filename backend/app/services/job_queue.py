@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.config import JOB_DB_PATH, PIPELINE_WORKERS, PIPELINE_MAX_PENDING
+from app.services.pipeline_runner import run_pipeline
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue already holds PIPELINE_MAX_PENDING waiting jobs."""
+
+
+class JobStore:
+    """Tiny SQLite-backed job table.
+
+    One connection shared across worker threads, serialized with a lock; writes are
+    small (a stage transition every few seconds at most) so contention is negligible.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    niche TEXT,
+                    upload INTEGER,
+                    status TEXT,
+                    stage TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    timings TEXT,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            # Jobs that were queued/running when the previous process died will never finish.
+            self._conn.execute(
+                "UPDATE jobs SET status='failed', error=?, finished_at=? WHERE status IN ('queued', 'running')",
+                ("Interrupted by server restart", time.time()),
+            )
+
+    def create(self, job_id: str, niche: str, upload: bool):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, niche, upload, status, created_at, timings) VALUES (?, ?, ?, 'queued', ?, '{}')",
+                (job_id, niche, int(bool(upload)), time.time()),
+            )
+
+    def update(self, job_id: str, **fields):
+        if not fields:
+            return
+        for key in ("timings", "result"):
+            if key in fields and not isinstance(fields[key], str):
+                fields[key] = json.dumps(fields[key], default=str)
+        cols = ", ".join(f"{k}=?" for k in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id=?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, limit: int = 50, status: str | None = None) -> list[dict]:
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status=?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit)).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["upload"] = bool(job.get("upload"))
+        for key in ("timings", "result"):
+            raw = job.get(key)
+            try:
+                job[key] = json.loads(raw) if raw else None
+            except (TypeError, ValueError):
+                job[key] = None
+        return job
+
+
+class JobQueue:
+    """Bounded worker pool running pipelines in the background.
+
+    At most PIPELINE_WORKERS pipelines run concurrently; up to PIPELINE_MAX_PENDING
+    more may wait. Submissions beyond that raise QueueFullError so the API can shed
+    load instead of piling up threads.
+    """
+
+    def __init__(self, store: JobStore, workers: int = PIPELINE_WORKERS, max_pending: int = PIPELINE_MAX_PENDING):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(
+        self,
+        niche: str,
+        upload: bool = False,
+        runner: Callable[[Callable[[dict], None]], dict] | None = None,
+        fresh_idea: bool = False,
+    ) -> dict:
+        """Queue a pipeline run and return the freshly created job record.
+
+        runner receives the progress callback and must return the pipeline result dict;
+        it defaults to run_pipeline(niche, upload, fresh_idea) with the job_id doubling as run_id.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Job queue full ({self.workers} running, {self.max_pending} pending)")
+        job_id = uuid.uuid4().hex
+        try:
+            self.store.create(job_id, niche, upload)
+            if runner is None:
+                runner = lambda cb: run_pipeline(niche, upload=upload, on_update=cb, run_id=job_id, fresh_idea=fresh_idea)
+            self._executor.submit(self._run, job_id, runner)
+        except Exception:
+            self._slots.release()
+            raise
+        logging.info("Queued pipeline job %s (niche=%s)", job_id, niche)
+        return self.store.get(job_id)
+
+    def _run(self, job_id: str, runner: Callable[[Callable[[dict], None]], dict]):
+        try:
+            self.store.update(job_id, status="running", started_at=time.time())
+
+            def on_update(result: dict):
+                # The partial result carries preview_url (RENDER_PREVIEW) while Stage 4 is still running.
+                self.store.update(job_id, stage=result.get("stage"), timings=result.get("timings") or {}, result=result)
+
+            result = runner(on_update)
+            self.store.update(
+                job_id,
+                status="failed" if result.get("error") else "done",
+                stage=result.get("stage"),
+                timings=result.get("timings") or {},
+                result=result,
+                error=result.get("error"),
+                finished_at=time.time(),
+            )
+        except Exception as e:
+            logging.exception("Pipeline job %s crashed", job_id)
+            self.store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    def list(self, limit: int = 50, status: str | None = None) -> list[dict]:
+        return self.store.list(limit=limit, status=status)
+
+
+_queue: JobQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it (and the SQLite store) on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(JobStore(JOB_DB_PATH))
+        return _queue
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+from app.services import toolchain
+
+# Generous per-batch budget: engine startup plus a few seconds of speech per line.
+_BATCH_BASE_TIMEOUT = 30.0
+_BATCH_PER_JOB_TIMEOUT = 15.0
+# The worker runs as `python -m app.services.local_tts` with this directory on its path.
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_AUTHKEY_ENV = "AUTOVIDAI_TTS_AUTHKEY"
+
+
+def _worker_main(conn, rate_factor: float) -> None:
+    """Entry point of the TTS process: initialize pyttsx3 once, then serve batches until told to stop.
+
+    Each request is a list of (scene_index, text, wav_path); every line of a batch is queued
+    with save_to_file and rendered by a single runAndWait() loop. The reply maps scene_index
+    to None on success or an error string.
+    """
+    try:
+        import pyttsx3
+        engine = pyttsx3.init()
+        try:
+            engine.setProperty('rate', int(engine.getProperty('rate') * rate_factor))
+        except Exception:
+            pass
+    except Exception as e:
+        conn.send({"ready": False, "error": str(e)})
+        return
+    conn.send({"ready": True})
+    while True:
+        try:
+            jobs = conn.recv()
+        except EOFError:
+            break
+        if jobs is None:
+            break
+        errors = {}
+        try:
+            for scene_index, text, wav_path in jobs:
+                if os.path.lexists(wav_path):
+                    os.remove(wav_path)
+                engine.save_to_file(text, wav_path)
+            engine.runAndWait()
+        except Exception as e:
+            errors = {scene_index: str(e) for scene_index, _, _ in jobs}
+        for scene_index, _, wav_path in jobs:
+            if scene_index not in errors and not (os.path.exists(wav_path) and os.path.getsize(wav_path) > 0):
+                errors[scene_index] = "engine produced no audio"
+        conn.send({scene_index: errors.get(scene_index) for scene_index, _, _ in jobs})
+
+
+class LocalTTSWorker:
+    """Long-lived pyttsx3 process shared by every Stage 3 run.
+
+    pyttsx3 engines are slow to initialize and not thread-safe, so a single child process
+    owns one engine for the lifetime of the server and synthesizes whole batches of lines
+    per request. Calls are serialized; a worker that dies or hangs is killed and respawned
+    on the next batch.
+    """
+
+    def __init__(self, rate_factor: float):
+        self.rate_factor = rate_factor
+        self._lock = threading.Lock()
+        self._proc = None
+        self._conn = None
+
+    def _start(self) -> None:
+        # A fresh interpreter running this module, not multiprocessing spawn: spawn re-imports
+        # the caller's __main__, which re-runs any script without a __main__ guard. The child
+        # connects back over an authenticated local socket.
+        authkey = secrets.token_bytes(32)
+        with Listener(("127.0.0.1", 0), authkey=authkey) as listener:
+            host, port = listener.address
+            env = {
+                **os.environ,
+                _AUTHKEY_ENV: authkey.hex(),
+                "PYTHONPATH": os.pathsep.join(p for p in (_BACKEND_DIR, os.environ.get("PYTHONPATH")) if p),
+            }
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "app.services.local_tts", f"{host}:{port}", str(self.rate_factor)],
+                env=env,
+                stdin=subprocess.DEVNULL,
+            )
+            accepted = []
+
+            def accept():
+                try:
+                    accepted.append(listener.accept())
+                except Exception as e:  # listener closed on timeout, or a bad handshake
+                    logging.debug("Local TTS worker connection failed: %s", e)
+
+            acceptor = threading.Thread(target=accept, name="local-tts-accept", daemon=True)
+            acceptor.start()
+            acceptor.join(_BATCH_BASE_TIMEOUT)
+        if not accepted:
+            proc.kill()
+            raise RuntimeError("local TTS worker did not start in time")
+        conn = accepted[0]
+        if not conn.poll(_BATCH_BASE_TIMEOUT):
+            proc.kill()
+            raise RuntimeError("local TTS worker did not start in time")
+        hello = conn.recv()
+        if not hello.get("ready"):
+            proc.wait(timeout=5)
+            raise RuntimeError(f"local TTS engine unavailable: {hello.get('error')}")
+        self._proc, self._conn = proc, conn
+        logging.info("Local TTS worker started (pid=%s)", proc.pid)
+
+    def _stop(self) -> None:
+        if self._proc is None:
+            return
+        try:
+            self._conn.send(None)
+            self._proc.wait(timeout=2)
+        except Exception:
+            pass
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc, self._conn = None, None
+
+    def synthesize(self, jobs: list) -> dict:
+        """Render [(scene_index, text, wav_path), ...]; returns {scene_index: error or None}.
+
+        Raises RuntimeError when the worker can't be started or the batch times out.
+        """
+        if not jobs:
+            return {}
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._stop()
+                self._start()
+            try:
+                self._conn.send(list(jobs))
+                if not self._conn.poll(_BATCH_BASE_TIMEOUT + _BATCH_PER_JOB_TIMEOUT * len(jobs)):
+                    raise RuntimeError(f"local TTS batch of {len(jobs)} lines timed out")
+                return self._conn.recv()
+            except (EOFError, OSError, RuntimeError):
+                self._stop()
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+def convert_wavs_to_mp3(pairs: list) -> bool:
+    """Encode [(wav_path, mp3_path), ...] to MP3 with a single ffmpeg process.
+
+    Returns False when ffmpeg/libmp3lame is missing or the conversion fails, leaving the WAVs in place.
+    """
+    if not pairs or not toolchain.has_encoder("libmp3lame"):
+        return False
+    cmd = ["ffmpeg", "-y"]
+    for wav_path, _ in pairs:
+        cmd += ["-i", wav_path]
+    for i, (_, mp3_path) in enumerate(pairs):
+        if os.path.lexists(mp3_path):
+            os.remove(mp3_path)
+        cmd += ["-map", f"{i}:a", "-codec:a", "libmp3lame", "-qscale:a", "4", mp3_path]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return True
+    except Exception as e:
+        logging.warning("ffmpeg mp3 conversion failed: %s", e)
+        return False
+
+
+_worker: LocalTTSWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def get_local_tts_worker(rate_factor: float) -> LocalTTSWorker:
+    """Return the process-wide local TTS worker (the child process starts on first batch)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = LocalTTSWorker(rate_factor)
+            atexit.register(_worker.close)
+        return _worker
+
+
+if __name__ == "__main__":
+    # Worker process entry point (see LocalTTSWorker._start): argv is "<host>:<port> <rate_factor>".
+    _host, _port = sys.argv[1].rsplit(":", 1)
+    _conn = Client((_host, int(_port)), authkey=bytes.fromhex(os.environ.pop(_AUTHKEY_ENV)))
+    _worker_main(_conn, float(sys.argv[2]))
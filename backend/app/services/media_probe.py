@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.services import toolchain
+
+_probes: dict[tuple, dict | None] = {}
+_probes_lock = threading.Lock()
+
+
+def _float(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(path: str) -> dict | None:
+    """ffprobe a local file: {"duration", "video": {...} | None, "audio": {...} | None}.
+
+    Results are memoized per (path, size, mtime) for the process lifetime. Returns None
+    when ffprobe is unavailable, the path is not a local file, or probing fails.
+    """
+    if not path or not os.path.isfile(path) or not toolchain.ffprobe_available():
+        return None
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _probes_lock:
+        if memo_key in _probes:
+            return _probes[memo_key]
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "format=duration:stream=codec_type,codec_name,width,height,r_frame_rate,pix_fmt,sample_rate,channels,duration",
+        "-of", "json", path,
+    ]
+    try:
+        data = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=30).stdout)
+    except Exception as e:
+        logging.debug("ffprobe failed for %s: %s", path, e)
+        return None
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    info = {
+        "duration": _float((data.get("format") or {}).get("duration")),
+        "video": None if video is None else {
+            "codec": video.get("codec_name"),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "fps": video.get("r_frame_rate"),
+            "pix_fmt": video.get("pix_fmt"),
+            "duration": _float(video.get("duration")),
+        },
+        "audio": None if audio is None else {
+            "codec": audio.get("codec_name"),
+            "sample_rate": audio.get("sample_rate"),
+            "channels": audio.get("channels"),
+            "duration": _float(audio.get("duration")),
+        },
+    }
+    with _probes_lock:
+        _probes[memo_key] = info
+    return info
+
+
+def probe_many(paths: list, workers: int | None = None) -> dict:
+    """Probe many files concurrently (one ffprobe process each); returns {path: info | None}."""
+    unique = list(dict.fromkeys(p for p in paths if p))
+    if not unique:
+        return {}
+    workers = workers or min(8, len(unique), (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ffprobe") as pool:
+        return dict(zip(unique, pool.map(probe_media, unique)))
+
+
+def _local(path):
+    if not isinstance(path, str) or path.startswith(("http://", "https://")):
+        return None
+    return path
+
+
+def annotate_assets(assets: list, resolve: Callable[[str], str | None] = _local) -> list:
+    """Record measured durations and stream info on scene assets, in place; returns assets.
+
+    One probe pass covers every scene's narration and clip. resolve maps an asset path to a
+    local file to probe (or None to skip it); by default remote URLs are skipped. Sets
+    audio_duration (skipped for placeholder narration) and video_duration/width/height.
+    """
+    if not assets or not toolchain.ffprobe_available():
+        return assets
+    audio_paths = [None if a.get("audio_placeholder") else resolve(a.get("audio_path")) for a in assets]
+    video_paths = [resolve(a.get("video_url")) for a in assets]
+    infos = probe_many(audio_paths + video_paths)
+    for asset, audio_path, video_path in zip(assets, audio_paths, video_paths):
+        audio = infos.get(audio_path) if audio_path else None
+        if audio and audio.get("audio"):
+            duration = audio["audio"].get("duration") or audio.get("duration")
+            if duration:
+                asset["audio_duration"] = round(duration, 3)
+        clip = infos.get(video_path) if video_path else None
+        if clip and clip.get("video"):
+            stream = clip["video"]
+            duration = stream.get("duration") or clip.get("duration")
+            if duration:
+                asset["video_duration"] = round(duration, 3)
+            if stream.get("width") and stream.get("height"):
+                asset["video_width"], asset["video_height"] = stream["width"], stream["height"]
+    return assets
@@ -3,24 +3,154 @@ import logging
 from dotenv import load_dotenv
 
 # Reuse existing stage modules from the root project
-from app.stages.stage_1_idea_engine import generate_video_idea
-from app.stages.stage_2_scriptwriter import generate_video_script
-from app.stages.stage_3_media_engine import generate_media_assets
+from app.stages.stage_1_idea_engine import generate_video_idea, get_cached_idea
+from app.stages.stage_2_scriptwriter import (
+    build_script_prompt,
+    generate_idea_and_script,
+    generate_video_script,
+    stream_script_scenes,
+)
+from app.stages.stage_3_media_engine import generate_media_assets, generate_media_assets_stream
 from app.stages.stage_4_renderer import render_video
 from app.stages.stage_5_distributor import upload_video_to_youtube
+from app.services import run_artifacts
+from app.services.run_artifacts import STAGES
+from app.config import RENDER_PREVIEW, FUSED_IDEA_SCRIPT, SCRIPT_STREAMING
 import os, time, shutil, re
+from typing import Callable
 
 
-def run_pipeline(niche: str, upload: bool = False) -> dict:
+def run_pipeline(
+    niche: str,
+    upload: bool = False,
+    on_update: Callable[[dict], None] | None = None,
+    run_id: str | None = None,
+    fresh_idea: bool = False,
+) -> dict:
     """
     Orchestrate the entire video creation pipeline from idea to publish.
     Returns a structured result for programmatic use by the API layer.
+
+    Stage 1 reuses a cached idea for the same niche unless fresh_idea is set.
+
+    on_update, if given, is called with the (partial) result dict whenever the
+    pipeline enters a new stage and once more when it finishes or fails. The job
+    queue uses this to persist progress; callback errors never break the run.
+
+    Every stage output is checkpointed under the run's artifact directory
+    (result["run_id"]) so a failed run can be continued with resume().
     """
     load_dotenv()
-    logging.info("Starting pipeline — niche=%s", niche)
+    run_id = run_id or run_artifacts.new_run_id()
+    logging.info("Starting pipeline — niche=%s run_id=%s", niche, run_id)
+    run_artifacts.save_meta(run_id, niche, upload)
+    return _execute(run_id, niche, upload, "idea", {}, on_update, fresh_idea=fresh_idea)
+
+
+def resume(
+    run_id: str,
+    from_stage: str | None = None,
+    upload: bool | None = None,
+    on_update: Callable[[dict], None] | None = None,
+) -> dict:
+    """Continue a previous run, re-executing only from `from_stage` onwards.
+
+    Outputs of earlier stages are reloaded from the run's checkpoints. When
+    from_stage is omitted, the first stage without a checkpoint is used (i.e. the
+    stage that failed). upload defaults to the value of the original run.
+    """
+    load_dotenv()
+    try:
+        meta = run_artifacts.load_meta(run_id)
+    except ValueError as e:
+        return {"run_id": run_id, "stage": None, "error": str(e)}
+    if meta is None:
+        return {"run_id": run_id, "stage": None, "error": f"Unknown run_id: {run_id}"}
+    niche = meta.get("niche")
+    upload = meta.get("upload", False) if upload is None else upload
+    done = run_artifacts.completed_stages(run_id)
+    if from_stage is None:
+        from_stage = next((s for s in STAGES if s not in done), "upload")
+    if from_stage not in STAGES:
+        return {"run_id": run_id, "stage": None, "error": f"Invalid from_stage '{from_stage}'; expected one of {STAGES}"}
+    preload = {}
+    for stage in STAGES[:STAGES.index(from_stage)]:
+        if stage == "upload":
+            continue
+        data = run_artifacts.load_stage(run_id, stage)
+        if data is None:
+            return {
+                "run_id": run_id,
+                "stage": None,
+                "error": f"Cannot resume from '{from_stage}': no checkpoint for stage '{stage}'",
+            }
+        preload[stage] = data
+    logging.info("Resuming pipeline — run_id=%s from_stage=%s (reusing %s)", run_id, from_stage, list(preload))
+    run_artifacts.save_meta(run_id, niche, upload)
+    return _execute(run_id, niche, upload, from_stage, preload, on_update)
+
+
+def _stream_script_and_assets(idea: dict, on_script_done: Callable[[], None], work_dir: str) -> tuple[dict, list | None]:
+    """Streaming Stage 2 feeding Stage 3: returns (script, assets).
+
+    Scenes go to generate_media_assets_stream as Gemini finishes each one. If the stream
+    fails before the first scene, the regular Stage 2 request (and its stub fallback)
+    supplies the scenes instead. If it breaks midway or ends incomplete (no closing scenes
+    array, fewer than MIN_SCRIPT_SCENES), the partial script and its assets are discarded:
+    the regular Stage 2 request supplies the script and assets is None, so Stage 3 runs on
+    it as usual. on_script_done runs once a streamed script is complete while media
+    fetches may still be running.
+    """
+    prompt = build_script_prompt(idea)
+    script = {"scenes": [], "_prompt": prompt}
+    broken = []
+
+    def scene_feed():
+        streamed = 0
+        try:
+            for scene in stream_script_scenes(idea, override_prompt=prompt):
+                streamed += 1
+                yield scene
+        except Exception as e:
+            if streamed:
+                logging.warning("Script stream incomplete after %d scenes (%s); discarding them", streamed, e)
+                broken.append(e)
+                return
+            logging.warning("Script streaming failed (%s); falling back to a regular Stage 2 request", e)
+            fallback = generate_video_script(idea)
+            if isinstance(fallback, dict):
+                script.update(fallback)
+                yield from fallback.get("scenes") or []
+        on_script_done()
+
+    scenes, assets = generate_media_assets_stream(scene_feed(), work_dir=work_dir)
+    if broken:
+        return generate_video_script(idea), None
+    script["scenes"] = scenes
+    return script, assets
+
+
+def _execute(
+    run_id: str,
+    niche: str,
+    upload: bool,
+    from_stage: str,
+    preload: dict,
+    on_update: Callable[[dict], None] | None,
+    fresh_idea: bool = False,
+) -> dict:
+    """Run stages from `from_stage` onwards; earlier stage outputs come from `preload`."""
+    start_index = STAGES.index(from_stage)
+    # Per-run scratch space so concurrent runs (PIPELINE_WORKERS > 1) never share media paths.
+    work_dir = run_artifacts.work_dir(run_id)
+
+    def should_run(stage: str) -> bool:
+        return STAGES.index(stage) >= start_index
 
     result = {
+        "run_id": run_id,
         "niche": niche,
+        "resumed_from": from_stage if start_index > 0 else None,
         "stage": None,
         "idea": None,
         "script": None,
@@ -30,62 +160,125 @@ def run_pipeline(niche: str, upload: bool = False) -> dict:
         "final_video_url": None,
         "uploaded": False,
         "error": None,
+        "timings": {},
     }
+    stage_started = [time.monotonic()]
+
+    def notify():
+        if on_update is None:
+            return
+        try:
+            on_update(result)
+        except Exception as e:
+            logging.warning("Pipeline progress callback failed: %s", e)
+
+    def enter_stage(stage: str):
+        # Close the timing of the previous stage before switching.
+        now = time.monotonic()
+        prev = result.get("stage")
+        if prev and prev != "done":
+            result["timings"][prev] = round(now - stage_started[0], 3)
+        stage_started[0] = now
+        result["stage"] = stage
+        notify()
 
     try:
-        # Stage 1: Idea
-        result["stage"] = "idea"
-        idea = generate_video_idea(niche)
-        # print("Stage 1 idea:", idea)
-        if isinstance(idea, dict) and idea.get("error"):
-            raise RuntimeError(f"Stage 1 failed: {idea['error']}")
+        # Stage 1: Idea (with FUSED_IDEA_SCRIPT, the script comes from the same model call)
+        fused_script = None
+        if should_run("idea"):
+            enter_stage("idea")
+            if FUSED_IDEA_SCRIPT and (fresh_idea or get_cached_idea(niche) is None):
+                idea, fused_script = generate_idea_and_script(niche, fresh=fresh_idea)
+            else:
+                idea = generate_video_idea(niche, fresh=fresh_idea)
+            # print("Stage 1 idea:", idea)
+            if isinstance(idea, dict) and idea.get("error"):
+                raise RuntimeError(f"Stage 1 failed: {idea['error']}")
+            run_artifacts.save_stage(run_id, "idea", idea)
+            logging.info("Stage 1 complete")
+            logging.debug("IDEA: %s", json.dumps(idea, indent=2))
+        else:
+            idea = preload["idea"]
         result["idea"] = idea
-        logging.info("Stage 1 complete")
-        logging.debug("IDEA: %s", json.dumps(idea, indent=2))
 
         # Stage 2: Script
-        result["stage"] = "script"
-        script = generate_video_script(idea)
-        if (not isinstance(script, dict)) or (not script.get("scenes")) or script.get("error"):
-            raise RuntimeError(
-                f"Stage 2 failed: {script.get('error') if isinstance(script, dict) else 'invalid script'}"
-            )
+        streamed_assets = None
+        if should_run("script"):
+            enter_stage("script")
+            if fused_script is not None:
+                script = fused_script
+            elif SCRIPT_STREAMING and should_run("assets"):
+                # Stage 3 fetches each scene's media while the rest of the script is still streaming.
+                # streamed_assets is None when an incomplete stream fell back to the regular request.
+                script, streamed_assets = _stream_script_and_assets(idea, lambda: enter_stage("assets"), work_dir)
+            else:
+                script = generate_video_script(idea)
+            if (not isinstance(script, dict)) or (not script.get("scenes")) or script.get("error"):
+                raise RuntimeError(
+                    f"Stage 2 failed: {script.get('error') if isinstance(script, dict) else 'invalid script'}"
+                )
+            run_artifacts.save_stage(run_id, "script", script)
+            logging.info("Stage 2 complete")
+            logging.debug("SCRIPT: %s", json.dumps(script, indent=2))
+        else:
+            script = preload["script"]
         result["script"] = script
         # Propagate the prompt used by Stage 2 if available.
         if isinstance(script, dict) and script.get("_prompt"):
             result["prompt"] = script["_prompt"]
-        logging.info("Stage 2 complete")
-        logging.debug("SCRIPT: %s", json.dumps(script, indent=2))
 
         # Stage 3: Assets (always run so we can test through media generation)
-        result["stage"] = "assets"
-        assets = generate_media_assets(script)
-        if not assets:
-            raise RuntimeError("Stage 3 failed: no assets generated")
+        if should_run("assets"):
+            if streamed_assets is not None:
+                assets = streamed_assets
+            else:
+                enter_stage("assets")
+                assets = generate_media_assets(script, work_dir=work_dir)
+            if not assets:
+                raise RuntimeError("Stage 3 failed: no assets generated")
+            assets = run_artifacts.save_stage(run_id, "assets", assets)
+            logging.info("Stage 3 complete")
+        else:
+            assets = preload["assets"]
         result["assets"] = assets
-        logging.info("Stage 3 complete")
 
         # Optional: stop after Stage 3 for faster testing (skip render + upload).
         if os.getenv("AUTOVIDAI_DISABLE_STAGES_4_AND_5", "").lower() in {"1", "true", "yes"}:
             logging.info("Test mode: skipping stages 4–5 (render, upload)")
-            result["stage"] = "done"
+            enter_stage("done")
+            run_artifacts.clear_work_dir(run_id)
             return result
 
         # Stage 4: Render
-        result["stage"] = "render"
         title = idea.get("title", "AI Generated Video") if isinstance(idea, dict) else "AI Generated Video"
-        render_result = render_video(assets, title)
-        if (not isinstance(render_result, dict)) or render_result.get("error") or ("final_video_url" not in render_result):
-            raise RuntimeError(
-                f"Stage 4 failed: {render_result.get('error') if isinstance(render_result, dict) else 'invalid render result'}"
+        if should_run("render"):
+            enter_stage("render")
+            def on_preview(preview: dict):
+                result["preview_url"] = preview["preview_url"]
+                notify()
+            render_result = render_video(
+                assets,
+                title,
+                on_preview=on_preview if RENDER_PREVIEW else None,
+                work_dir=work_dir,
+                preview_name=run_id,
             )
+            if (not isinstance(render_result, dict)) or render_result.get("error") or ("final_video_url" not in render_result):
+                raise RuntimeError(
+                    f"Stage 4 failed: {render_result.get('error') if isinstance(render_result, dict) else 'invalid render result'}"
+                )
+            render_result = run_artifacts.save_stage(run_id, "render", render_result)
+            logging.info("Stage 4 complete — final_url=%s", render_result["final_video_url"])
+        else:
+            render_result = preload["render"]
         result["render"] = render_result
         result["final_video_url"] = render_result["final_video_url"]
-        logging.info("Stage 4 complete — final_url=%s", result["final_video_url"])
+        if render_result.get("preview_url"):
+            result["preview_url"] = render_result["preview_url"]
 
         # Append video to local library with a unique name (if local render)
         try:
-            if isinstance(render_result, dict) and render_result.get("local") and os.path.exists(result["final_video_url"] or ""):
+            if should_run("render") and isinstance(render_result, dict) and render_result.get("local") and os.path.exists(result["final_video_url"] or ""):
                 base_dir = os.path.join("temp", "render_local")
                 os.makedirs(base_dir, exist_ok=True)
                 # Build a slug from the title
@@ -94,6 +287,13 @@ def run_pipeline(niche: str, upload: bool = False) -> dict:
                 target_name = f"{slug}-{ts}.mp4"
                 target_path = os.path.join(base_dir, target_name)
                 shutil.copyfile(result["final_video_url"], target_path)
+                preview_src = render_result.get("preview_url")
+                if preview_src and os.path.exists(preview_src):
+                    # The run's previews/<run_id>.mp4 becomes the library entry's preview.
+                    preview_target = os.path.join(base_dir, "previews", target_name)
+                    os.replace(preview_src, preview_target)
+                    result["preview_url"] = preview_target
+                    result["library_preview_url"] = f"/files/previews/{target_name}"
                 # Include library url for convenience
                 result["library_file"] = target_name
                 result["library_url"] = f"/files/{target_name}"
@@ -102,7 +302,7 @@ def run_pipeline(niche: str, upload: bool = False) -> dict:
 
         # Stage 5: Upload (optional)
         if upload:
-            result["stage"] = "upload"
+            enter_stage("upload")
             video_title = title
             video_description = (
                 idea.get("description", "This video was generated automatically.")
@@ -111,13 +311,17 @@ def run_pipeline(niche: str, upload: bool = False) -> dict:
             )
             upload_video_to_youtube(result["final_video_url"], video_title, video_description)
             result["uploaded"] = True
+            run_artifacts.save_stage(run_id, "upload", {"uploaded": True})
             logging.info("Stage 5 complete (uploaded)")
 
-        result["stage"] = "done"
+        enter_stage("done")
+        run_artifacts.clear_work_dir(run_id)
         logging.info("Pipeline finished successfully")
         return result
 
     except Exception as e:
         logging.exception("Pipeline failed at stage: %s", result.get("stage"))
         result["error"] = str(e)
+        result["timings"][result.get("stage") or from_stage] = round(time.monotonic() - stage_started[0], 3)
+        notify()
         return result
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+
+from app.config import RUNS_DIR
+
+# Ordered pipeline stages that produce a checkpoint. 'upload' has no artifact of its own.
+STAGES = ["idea", "script", "assets", "render", "upload"]
+
+_RUN_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def run_dir(run_id: str) -> str:
+    """Return the artifact directory for a run (validated to stay inside RUNS_DIR)."""
+    if not isinstance(run_id, str) or not _RUN_ID_RE.match(run_id):
+        raise ValueError(f"Invalid run_id: {run_id!r}")
+    return os.path.join(RUNS_DIR, run_id)
+
+
+def work_dir(run_id: str) -> str:
+    """Return the run's scratch directory for Stage 3/4 intermediates (audio, clips, segments).
+
+    Every run writes its per-scene files here, so concurrent pipeline workers never
+    overwrite each other's temp/audio_scene_{i}.mp3 or render segments.
+    """
+    return os.path.join(run_dir(run_id), "work")
+
+
+def clear_work_dir(run_id: str) -> None:
+    """Delete a finished run's scratch files; checkpoints keep their own copies under files/."""
+    shutil.rmtree(work_dir(run_id), ignore_errors=True)
+
+
+def _write_json(path: str, data) -> None:
+    # Write to a temp file first so a crash never leaves a half-written checkpoint behind.
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_meta(run_id: str, niche: str, upload: bool) -> None:
+    d = run_dir(run_id)
+    os.makedirs(d, exist_ok=True)
+    meta_path = os.path.join(d, "meta.json")
+    meta = {"run_id": run_id, "niche": niche, "upload": bool(upload), "created_at": time.time()}
+    if os.path.exists(meta_path):
+        meta = {**_read_json(meta_path), "niche": niche, "upload": bool(upload)}
+    _write_json(meta_path, meta)
+
+
+def load_meta(run_id: str) -> dict | None:
+    path = os.path.join(run_dir(run_id), "meta.json")
+    if not os.path.exists(path):
+        return None
+    return _read_json(path)
+
+
+def _persist_local_file(run_id: str, path: str, name: str) -> str:
+    """Copy a local media file into the run directory's files/ so the checkpoint owns it.
+
+    Stage 3/4 outputs live in the run's work dir (rewritten when a stage is re-run, removed
+    once the run finishes) or in shared caches; a checkpoint that merely pointed there could
+    lose its files or silently pick up different ones on resume.
+    """
+    if not isinstance(path, str) or path.startswith(("http://", "https://")) or not os.path.isfile(path):
+        return path
+    files_dir = os.path.join(run_dir(run_id), "files")
+    os.makedirs(files_dir, exist_ok=True)
+    ext = os.path.splitext(path)[1] or ".bin"
+    dest = os.path.join(files_dir, name + ext)
+    if os.path.abspath(dest) == os.path.abspath(path):
+        return path
+    try:
+        shutil.copyfile(path, dest)
+        return dest
+    except Exception as e:
+        logging.warning("Could not copy %s into run %s: %s", path, run_id, e)
+        return path
+
+
+def save_stage(run_id: str, stage: str, data):
+    """Persist a stage output as <run_dir>/<stage>.json and return the (possibly rewritten) data.
+
+    Local files referenced by assets and local renders are copied into the run directory
+    and the returned data points at those copies.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage: {stage}")
+    d = run_dir(run_id)
+    os.makedirs(d, exist_ok=True)
+    if stage == "assets" and isinstance(data, list):
+        data = [dict(a) for a in data]
+        for i, asset in enumerate(data):
+            if asset.get("audio_path"):
+                asset["audio_path"] = _persist_local_file(run_id, asset["audio_path"], f"audio_scene_{i}")
+            if asset.get("video_url"):
+                asset["video_url"] = _persist_local_file(run_id, asset["video_url"], f"video_scene_{i}")
+    elif stage == "render" and isinstance(data, dict) and data.get("local"):
+        data = dict(data)
+        data["final_video_url"] = _persist_local_file(run_id, data.get("final_video_url"), "final_video")
+    _write_json(os.path.join(d, f"{stage}.json"), data)
+    return data
+
+
+def load_stage(run_id: str, stage: str):
+    path = os.path.join(run_dir(run_id), f"{stage}.json")
+    if not os.path.exists(path):
+        return None
+    return _read_json(path)
+
+
+def completed_stages(run_id: str) -> list[str]:
+    """Return the checkpointed stages of a run, in pipeline order."""
+    d = run_dir(run_id)
+    return [s for s in STAGES if os.path.exists(os.path.join(d, f"{s}.json"))]
@@ -0,0 +1,216 @@
+import hmac
+import logging
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from app.config import (
+    STABLE_VIDEO_SERVER_URL,
+    STABLE_VIDEO_POLL_INTERVAL,
+    SVD_JOB_TIMEOUT,
+    SVD_POLL_MAX_INTERVAL,
+    SVD_CALLBACK_URL,
+    SVD_MAX_CONCURRENCY,
+)
+
+_BACKOFF_FACTOR = 1.5
+_JITTER = 0.25
+
+
+class _Job:
+    __slots__ = ("future", "deadline", "interval", "next_poll", "token")
+
+    def __init__(self, future: Future, deadline: float, interval: float, token: str = ""):
+        self.future = future
+        self.token = token
+        self.deadline = deadline
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+
+
+class SVDClient:
+    """Client for a Stable Video Diffusion server that tracks every job with one poller thread.
+
+    submit() starts a job and returns a Future resolving to the clip URL, so all scene
+    prompts can be in flight at once and total wall time approaches the slowest job
+    instead of the sum. A single background thread polls due jobs with exponential
+    backoff and jitter; when callback_url is set the server may also POST completions
+    to it (forwarded to complete()), and polling then only acts as a slow safety net.
+
+    Each job's callback_url carries a random per-job token; complete() only accepts a
+    webhook whose token matches the job it names and whose clip URL is on the SVD server.
+
+    Server API:
+        POST {base_url}/generate {prompt, callback_url?} -> {id}
+        GET  {base_url}/status/{id} -> {status, url?}
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        poll_interval: float,
+        max_interval: float,
+        job_timeout: float,
+        callback_url: str = "",
+        max_concurrency: int = 2,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = max(0.05, poll_interval)
+        self.max_interval = max(self.poll_interval, max_interval)
+        self.job_timeout = job_timeout
+        self.callback_url = callback_url
+        # Caps concurrent HTTP requests to the server (submissions and status checks), not jobs.
+        self._requests = threading.BoundedSemaphore(max_concurrency)
+        self._cond = threading.Condition()
+        self._jobs: dict[str, _Job] = {}
+        self._poller: threading.Thread | None = None
+
+    def submit(self, prompt: str) -> Future:
+        """Start a generation job; the Future yields the clip URL or raises on failure/timeout."""
+        future: Future = Future()
+        payload = {"prompt": prompt}
+        token = ""
+        if self.callback_url:
+            token = secrets.token_urlsafe(24)
+            payload["callback_url"] = _with_query(self.callback_url, token=token)
+        try:
+            with self._requests:
+                r = requests.post(f"{self.base_url}/generate", json=payload, timeout=15)
+            if not r.ok:
+                logging.warning("SVD generate non-OK %s: %s", r.status_code, r.text[:120])
+                raise RuntimeError("svd generate failed")
+            job_id = r.json().get("id")
+            if not job_id:
+                raise RuntimeError("svd missing id")
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        # With a webhook the poller is only a fallback, so it starts at the slow end of the backoff.
+        interval = self.max_interval if self.callback_url else self.poll_interval
+        with self._cond:
+            self._jobs[str(job_id)] = _Job(future, time.monotonic() + self.job_timeout, interval, token)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, name="svd-poller", daemon=True)
+                self._poller.start()
+            self._cond.notify()
+        return future
+
+    def complete(self, job_id: str, payload: dict, token: str = "") -> bool:
+        """Resolve a job from a webhook payload; returns False for unknown or non-terminal jobs.
+
+        Raises PermissionError when token is not the one issued for job_id, or when the
+        clip URL points anywhere but the SVD server.
+        """
+        job_id = str(job_id)
+        with self._cond:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        if not job.token or not hmac.compare_digest(job.token, token or ""):
+            raise PermissionError(f"invalid callback token for svd job {job_id}")
+        url = (payload or {}).get("url") or (payload or {}).get("video_url")
+        if url and not self._is_server_url(url):
+            raise PermissionError(f"svd job {job_id} callback url is not on the SVD server")
+        return self._handle(job_id, payload)
+
+    def _is_server_url(self, url: str) -> bool:
+        server, clip = urlsplit(self.base_url), urlsplit(str(url))
+        return clip.scheme in {"http", "https"} and clip.hostname == server.hostname and clip.port == server.port
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def _handle(self, job_id: str, payload: dict) -> bool:
+        status = (payload or {}).get("status")
+        if status in {"completed", "done"}:
+            url = payload.get("url") or payload.get("video_url")
+            outcome = ("result", url) if url else ("error", RuntimeError("svd job completed without url"))
+        elif status in {"failed", "error"}:
+            logging.warning("SVD job failed: %s", payload)
+            outcome = ("error", RuntimeError(f"svd job {job_id} failed"))
+        else:
+            return False
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return False
+        if outcome[0] == "result":
+            job.future.set_result(outcome[1])
+        else:
+            job.future.set_exception(outcome[1])
+        return True
+
+    def _poll_loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                for job_id, job in list(self._jobs.items()):
+                    if now >= job.deadline:
+                        del self._jobs[job_id]
+                        job.future.set_exception(TimeoutError(f"svd job {job_id} timed out"))
+                if not self._jobs:
+                    # Idle: exit after a while so an unused client holds no thread.
+                    if not self._cond.wait(timeout=60) and not self._jobs:
+                        self._poller = None
+                        return
+                    continue
+                due = [job_id for job_id, job in self._jobs.items() if job.next_poll <= now]
+                if not due:
+                    wake = min(min(j.next_poll for j in self._jobs.values()), min(j.deadline for j in self._jobs.values()))
+                    self._cond.wait(timeout=max(0.0, wake - now))
+                    continue
+            for job_id in due:
+                self._poll_once(job_id)
+
+    def _poll_once(self, job_id: str):
+        try:
+            with self._requests:
+                sr = requests.get(f"{self.base_url}/status/{job_id}", timeout=(5, 15))
+            if 400 <= sr.status_code < 500:
+                logging.warning("SVD status non-OK %s", sr.status_code)
+                self._handle(job_id, {"status": "failed", "http_status": sr.status_code})
+                return
+            sr.raise_for_status()
+            if self._handle(job_id, sr.json()):
+                return
+        except Exception as e:
+            # Transient (connection error, 5xx, bad JSON): keep backing off until the deadline.
+            logging.debug("SVD status check for %s failed: %s", job_id, e)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.interval = min(job.interval * _BACKOFF_FACTOR, self.max_interval)
+                job.next_poll = time.monotonic() + job.interval * random.uniform(1 - _JITTER, 1 + _JITTER)
+
+
+def _with_query(url: str, **params) -> str:
+    """Return url with params added to its query string."""
+    parts = urlsplit(url)
+    query = urlencode([*parse_qsl(parts.query), *params.items()])
+    return urlunsplit(parts._replace(query=query))
+
+
+_client: SVDClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_svd_client() -> SVDClient:
+    """Return the process-wide SVD client shared by Stage 3 and the webhook endpoint."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SVDClient(
+                STABLE_VIDEO_SERVER_URL,
+                STABLE_VIDEO_POLL_INTERVAL,
+                SVD_POLL_MAX_INTERVAL,
+                SVD_JOB_TIMEOUT,
+                callback_url=SVD_CALLBACK_URL,
+                max_concurrency=SVD_MAX_CONCURRENCY,
+            )
+        return _client
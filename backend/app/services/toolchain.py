@@ -0,0 +1,88 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+# Capabilities the stages care about; anything else in ffmpeg's lists is ignored.
+ENCODERS = ("libx264", "libmp3lame", "aac")
+FILTERS = ("drawtext", "subtitles")
+
+_probe: dict | None = None
+_probe_lock = threading.Lock()
+
+
+def _run(cmd: list) -> str:
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=10).stdout
+    except Exception as e:
+        logging.debug("Toolchain probe %s failed: %s", cmd, e)
+        return ""
+
+
+def _binary_info(name: str) -> dict:
+    path = shutil.which(name)
+    if path is None:
+        return {"ok": False, "path": None, "version": None}
+    first_line = (_run([path, "-hide_banner", "-version"]).splitlines() or [""])[0]
+    # e.g. "ffmpeg version 6.1.1-3ubuntu5 Copyright (c) ..."
+    parts = first_line.split()
+    version = parts[2] if len(parts) > 2 and parts[1] == "version" else (first_line or None)
+    return {"ok": True, "path": path, "version": version}
+
+
+def _listed_names(output: str) -> set:
+    """Names from `ffmpeg -encoders` / `-filters` output (second column after the flags)."""
+    names = set()
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and not line.startswith(" =") and parts[0] != "------":
+            names.add(parts[1])
+    return names
+
+
+def probe(refresh: bool = False) -> dict:
+    """Probe ffmpeg/ffprobe once per process and return the cached capability report.
+
+    {"ffmpeg": {ok, path, version}, "ffprobe": {...}, "encoders": {name: bool},
+     "filters": {name: bool}, "probed_at": epoch seconds}
+    """
+    global _probe
+    with _probe_lock:
+        if _probe is not None and not refresh:
+            return _probe
+        ffmpeg = _binary_info("ffmpeg")
+        ffprobe = _binary_info("ffprobe")
+        encoders, filters = set(), set()
+        if ffmpeg["ok"]:
+            encoders = _listed_names(_run([ffmpeg["path"], "-hide_banner", "-encoders"]))
+            filters = _listed_names(_run([ffmpeg["path"], "-hide_banner", "-filters"]))
+        _probe = {
+            "ffmpeg": ffmpeg,
+            "ffprobe": ffprobe,
+            "encoders": {name: name in encoders for name in ENCODERS},
+            "filters": {name: name in filters for name in FILTERS},
+            "probed_at": time.time(),
+        }
+        logging.info(
+            "Toolchain: ffmpeg=%s ffprobe=%s encoders=%s filters=%s",
+            ffmpeg["version"], ffprobe["version"],
+            [n for n, ok in _probe["encoders"].items() if ok], [n for n, ok in _probe["filters"].items() if ok],
+        )
+        return _probe
+
+
+def ffmpeg_available() -> bool:
+    return probe()["ffmpeg"]["ok"]
+
+
+def ffprobe_available() -> bool:
+    return probe()["ffprobe"]["ok"]
+
+
+def has_encoder(name: str) -> bool:
+    return probe()["encoders"].get(name, False)
+
+
+def has_filter(name: str) -> bool:
+    return probe()["filters"].get(name, False)
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from typing import Callable, List
+
+from app.config import SUGGEST_POOL_SIZE, SUGGEST_REFRESH_INTERVAL, SUGGEST_RETRY_INTERVAL
+
+
+class TrendingPool:
+    """In-memory, ranked pool of trending topics served stale-while-revalidate.
+
+    get() never waits on the model: it answers from the current pool and, once the pool
+    is older than refresh_interval, starts at most one background refresh. Model calls
+    therefore scale with the refresh interval, not with traffic. A failed refresh keeps
+    the previous pool and is retried after retry_interval.
+    """
+
+    def __init__(self, fetch: Callable[[int], List[str]], size: int, refresh_interval: float, retry_interval: float):
+        self.fetch = fetch
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._topics: List[str] = []
+        self._fetched_at = 0.0
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, count: int) -> List[str]:
+        """Return up to count topics from memory (empty until the first refresh lands)."""
+        with self._lock:
+            topics = self._topics[:count]
+        self.refresh_if_stale()
+        return topics
+
+    def refresh_if_stale(self) -> bool:
+        """Start a background refresh when the pool is stale; returns True if one was started."""
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._next_refresh:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="trending-refresh", daemon=True).start()
+        return True
+
+    def _refresh(self):
+        started = time.monotonic()
+        try:
+            topics = [t for t in self.fetch(self.size) if t]
+            if not topics:
+                raise ValueError("model returned no topics")
+        except Exception as e:
+            logging.warning("Trending topics refresh failed: %s", e)
+            with self._lock:
+                self.failures += 1
+                self._next_refresh = time.monotonic() + self.retry_interval
+                self._refreshing = False
+            return
+        with self._lock:
+            self._topics = topics
+            self._fetched_at = time.time()
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            self.refreshes += 1
+            self._refreshing = False
+        logging.info("Trending topics refreshed in %.2fs (%d topics)", time.monotonic() - started, len(topics))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "fetched_at": self._fetched_at or None,
+                "refresh_interval": self.refresh_interval,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "refreshing": self._refreshing,
+            }
+
+
+_pool: TrendingPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_trending_pool() -> TrendingPool:
+    """Return the process-wide trending pool behind POST /pipeline/suggest."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from app.stages.stage_1_idea_engine import DEV_FALLBACK_MODE, fetch_trending_niches, suggest_trending_niches
+            # Dev mode keeps the stub list (suggest_trending_niches never calls out there).
+            fetch = suggest_trending_niches if DEV_FALLBACK_MODE else fetch_trending_niches
+            _pool = TrendingPool(fetch, SUGGEST_POOL_SIZE, SUGGEST_REFRESH_INTERVAL, SUGGEST_RETRY_INTERVAL)
+        return _pool
@@ -1,16 +1,19 @@
+import hashlib
 import json
 import requests
 import re
 import logging
 import os
-from app.config import GEMINI_API_KEY
+from app.config import GEMINI_API_KEY, GEMINI_API_BASE, IDEA_CACHE_DIR, IDEA_CACHE_TTL, IDEA_CACHE_MAX_BYTES, IDEA_BATCH_SIZE
+from concurrent.futures import ThreadPoolExecutor
+from app.services.file_cache import JsonCache
 from typing import List
 
 # Allow overriding the Gemini model via env; default to a model commonly available per /providers/gemini/models.
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
 # Build endpoint (v1beta generateContent). "-latest" occasionally returns 404; use explicit model.
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
 
 # Detect dev / stub mode (no real key or intentionally using a placeholder) to enable graceful fallbacks.
 DEV_FALLBACK_MODE = (
@@ -20,7 +23,52 @@ DEV_FALLBACK_MODE = (
     or (isinstance(GEMINI_MODEL, str) and GEMINI_MODEL.startswith("stub_"))
 )
 
-def generate_video_idea(niche: str) -> dict:
+# Bump whenever master_prompt changes so cached ideas from the old prompt are not reused.
+IDEA_PROMPT_VERSION = 1
+# Same for the multi-niche prompt in _fetch_idea_batch; its ideas are cached under their own tag.
+IDEA_BATCH_PROMPT_VERSION = 1
+
+# Generated ideas shared by /stage2/prompt and pipeline runs on the same niche.
+_IDEA_CACHE = JsonCache("ideas", IDEA_CACHE_DIR, IDEA_CACHE_MAX_BYTES, IDEA_CACHE_TTL)
+
+
+def _normalize_niche(niche: str) -> str:
+    """Case- and whitespace-insensitive form of a niche, used for idea cache keys."""
+    return " ".join(str(niche).split()).lower()
+
+
+def _idea_cache_key(niche: str, batch: bool = False) -> str:
+    """Cache key for an idea from the single-niche prompt, or from the batch prompt with batch=True."""
+    version = f"batch-{IDEA_BATCH_PROMPT_VERSION}" if batch else IDEA_PROMPT_VERSION
+    return hashlib.sha256(f"{version}|{GEMINI_MODEL}|{_normalize_niche(niche)}".encode()).hexdigest()
+
+
+def _lookup_cached_idea(niche: str) -> dict | None:
+    """Cached idea from the single-niche prompt, else one stored by a batch request."""
+    cached = _IDEA_CACHE.get(_idea_cache_key(niche))
+    return cached if cached is not None else _IDEA_CACHE.get(_idea_cache_key(niche, batch=True))
+
+
+def get_cached_idea(niche: str) -> dict | None:
+    """Return the cached idea for the niche (as generate_video_idea would reuse it) without calling the model."""
+    if not niche or not str(niche).strip():
+        return None
+    return _lookup_cached_idea(" ".join(str(niche).split()))
+
+
+def cache_idea(niche: str, idea: dict) -> None:
+    """Store an idea generated outside generate_video_idea (fused Stage 1+2) under the niche's idea key."""
+    if niche and str(niche).strip() and _valid_idea(idea):
+        _IDEA_CACHE.put(_idea_cache_key(" ".join(str(niche).split())), idea)
+
+
+def generate_video_idea(niche: str, fresh: bool = False) -> dict:
+    """Generate a video idea for the niche, reusing a cached idea for the same niche when possible.
+
+    Ideas are cached per (normalized niche, model, prompt version) for IDEA_CACHE_TTL
+    seconds, and concurrent requests for the same niche share one Gemini call. fresh=True
+    always asks the model (and replaces the cached idea). Stub fallbacks are never cached.
+    """
     logging.info("--- Stage 1: Idea Engine ---")
     logging.info("Received niche: %s", niche)
 
@@ -30,7 +78,7 @@ def generate_video_idea(niche: str) -> dict:
         return {"error": "Missing required parameter: niche"}
 
     # Use the provided niche value (trim whitespace) and ensure prompt spacing is correct.
-    niche_clean = str(niche).strip()
+    niche_clean = " ".join(str(niche).split())
     master_prompt = f"""
         You are a social media expert who knows how to make short-form videos go viral.
         Your task is to develop a complete video concept for the niche: {niche_clean}.
@@ -53,32 +101,145 @@ def generate_video_idea(niche: str) -> dict:
         logging.warning("Gemini dev fallback mode active — returning stub idea (no external API call).")
         return _stub_idea(niche_clean)
 
-    logging.info("Calling Gemini model '%s' for idea generation...", GEMINI_MODEL)
-    headers = {'Content-Type': 'application/json'}
-    payload = {"contents": [{"parts": [{"text": master_prompt}]}]}
-
-    try:
+    def fetch() -> dict:
+        logging.info("Calling Gemini model '%s' for idea generation...", GEMINI_MODEL)
+        headers = {'Content-Type': 'application/json'}
+        payload = {"contents": [{"parts": [{"text": master_prompt}]}]}
         response = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=60)
         response.raise_for_status()
         response_data = response.json()
         text_content = response_data['candidates'][0]['content']['parts'][0]['text']
         json_match = re.search(r'\{.*\}', text_content, re.DOTALL)
         if not json_match:
+            logging.debug("Raw Response Text: %s", text_content)
             raise json.JSONDecodeError("No JSON object found in response", text_content, 0)
-        json_text = json_match.group(0)
-        video_idea = json.loads(json_text)
+        video_idea = json.loads(json_match.group(0))
         logging.info("✅ Idea generated successfully.")
         return video_idea
+
+    # An idea from a batch request counts too; misses go through the single-flight fetch.
+    cached = None if fresh else _lookup_cached_idea(niche_clean)
+    if cached is not None:
+        return cached
+    try:
+        return _IDEA_CACHE.get_or_fetch(_idea_cache_key(niche_clean), fetch, fresh=fresh)
     except requests.exceptions.RequestException as e:
         logging.error("❌ Error calling Gemini API: %s", e)
         # Graceful fallback — still produce a usable idea so pipeline can continue.
         return _stub_idea(niche_clean)
-    except (KeyError, IndexError, json.JSONDecodeError) as e:
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
         logging.error("❌ Error parsing Gemini response: %s", e)
-        logging.debug("Raw Response Text: %s", locals().get('text_content', 'Not available'))
         return _stub_idea(niche_clean)
 
 
+def _valid_idea(idea) -> bool:
+    """True when idea has every field downstream stages rely on."""
+    if not isinstance(idea, dict):
+        return False
+    if not all(isinstance(idea.get(k), str) and idea[k].strip() for k in ("title", "hook", "description", "cta")):
+        return False
+    points = idea.get("points")
+    return isinstance(points, list) and len(points) > 0 and all(isinstance(p, str) for p in points)
+
+
+def _fetch_idea_batch(niches: List[str]) -> dict:
+    """One Gemini request for several niches; returns {normalized niche: idea} for valid entries only."""
+    listing = "\n".join(f"- {n}" for n in niches)
+    prompt = f"""
+        You are a social media expert who knows how to make short-form videos go viral.
+        Develop a complete video concept for EACH of these niches:
+        {listing}
+        Keep the tone informal (TikTok-style), yet natural and engaging. Each idea should feel exciting and attention-grabbing, appealing to anyone on the internet and suitable for all social media platforms.
+        Respond with only a JSON array containing one object per niche, formatted as minified JSON with no Markdown formatting or additional commentary.
+        Every object must follow this exact structure, with "niche" copied verbatim from the list:
+        {{"niche": "...", "title": "Short, catchy Title Case title", "hook": "One-sentence opening line", "description": "Brief post description with 3-5 hashtags", "points": ["3 to 5 key points"], "cta": "Concise call-to-action"}}
+        Only output the JSON array and nothing else.
+    """
+    headers = {'Content-Type': 'application/json'}
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    logging.info("Calling Gemini model '%s' for %d ideas in one request...", GEMINI_MODEL, len(niches))
+    response = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=60 + 10 * len(niches))
+    response.raise_for_status()
+    text_content = response.json()['candidates'][0]['content']['parts'][0]['text']
+    arr_match = re.search(r'\[.*\]', text_content, re.DOTALL)
+    if not arr_match:
+        raise json.JSONDecodeError("No JSON array found in response", text_content, 0)
+    ideas = {}
+    for entry in json.loads(arr_match.group(0)):
+        if not isinstance(entry, dict):
+            continue
+        niche = entry.pop("niche", None)
+        if isinstance(niche, str) and _valid_idea(entry):
+            ideas[_normalize_niche(niche)] = entry
+    return ideas
+
+
+def generate_video_ideas(niches: List[str], fresh: bool = False) -> List[dict]:
+    """Generate ideas for many niches with as few Gemini requests as possible.
+
+    Returns one idea per input niche, in order. Cached ideas are reused (unless fresh);
+    the rest are requested IDEA_BATCH_SIZE niches per call, concurrently, and stored in the
+    idea cache so later pipeline runs on those niches skip Stage 1's model call. Niches the
+    batch answer misses or gets wrong are retried one by one via generate_video_idea;
+    niches whose whole request failed get a stub idea.
+    """
+    logging.info("--- Stage 1: Idea Engine (batch of %d niches) ---", len(niches))
+    cleaned = [" ".join(str(n or "").split()) for n in niches]
+    ideas: dict = {}
+    pending: dict = {}  # normalized niche -> niche as first given
+    for niche in cleaned:
+        if not niche:
+            continue
+        norm = _normalize_niche(niche)
+        if norm in ideas or norm in pending:
+            continue
+        if DEV_FALLBACK_MODE:
+            ideas[norm] = _stub_idea(niche)
+            continue
+        cached = None if fresh else _lookup_cached_idea(niche)
+        if cached is not None:
+            ideas[norm] = cached
+        else:
+            pending[norm] = niche
+
+    if pending:
+        todo = list(pending.values())
+        chunks = [todo[i:i + IDEA_BATCH_SIZE] for i in range(0, len(todo), IDEA_BATCH_SIZE)]
+
+        def run_chunk(chunk: List[str]) -> dict | None:
+            try:
+                return _fetch_idea_batch(chunk)
+            except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
+                logging.error("❌ Batched idea request for %d niches failed: %s", len(chunk), e)
+                return None
+
+        missing = []
+        with ThreadPoolExecutor(max_workers=min(len(chunks), 4), thread_name_prefix="idea-batch") as pool:
+            for chunk, answered in zip(chunks, pool.map(run_chunk, chunks)):
+                for niche in chunk:
+                    norm = _normalize_niche(niche)
+                    if answered is None:
+                        # The whole request failed: don't hammer the provider with one retry per niche.
+                        ideas[norm] = _stub_idea(niche)
+                    elif norm in answered:
+                        ideas[norm] = answered[norm]
+                        _IDEA_CACHE.put(_idea_cache_key(niche, batch=True), answered[norm])
+                    else:
+                        missing.append(niche)
+        if missing:
+            logging.warning("Batch answer missed %d of %d niches; retrying them individually", len(missing), len(todo))
+        for niche in missing:
+            ideas[_normalize_niche(niche)] = generate_video_idea(niche, fresh=True)
+
+    results = []
+    for niche in cleaned:
+        if not niche:
+            results.append({"error": "Missing required parameter: niche"})
+        else:
+            results.append(dict(ideas[_normalize_niche(niche)]))
+    return results
+
+
 def suggest_niche_via_model() -> str | None:
     """Ask the model to suggest a single concise, safe niche/topic.
 
@@ -133,61 +294,8 @@ def suggest_trending_niches(count: int = 5) -> List[str]:
         random.shuffle(stub)
         return stub[:n]
 
-    prompt = (
-        "List top trending short-form video topics. "
-        f"Return ONLY a compact JSON array of {n} strings, no markdown, no extra text. "
-        "Keep each item short (3-5 words), safe, and platform-appropriate."
-    )
-    headers = {'Content-Type': 'application/json'}
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
     try:
-        resp = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=25)
-        resp.raise_for_status()
-        data = resp.json()
-        text = data['candidates'][0]['content']['parts'][0]['text']
-        # Prefer a JSON array; fallback to line-based parsing
-        arr_match = re.search(r"\[.*\]", text, re.DOTALL)
-        if arr_match:
-            raw = arr_match.group(0)
-            arr = json.loads(raw)
-            topics = [
-                re.sub(r"[^\w\s-]", "", str(x)).strip()
-                for x in arr
-                if str(x).strip()
-            ]
-            topics = [t for t in topics if t]
-            return topics[:n] if topics else []
-        # Fallback: split lines
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-        topics: List[str] = []
-        for ln in lines:
-            # strip bullets, punctuation
-            t = re.sub(r"^[\-\*\d\.]+\s*", "", ln)
-            t = re.sub(r"[^\w\s-]", "", t).strip()
-            if t:
-                topics.append(t)
-            if len(topics) >= n:
-                break
-        # If model returned a single comma-separated line, split by commas/semicolons/pipes
-        if len(topics) <= 1 and lines:
-            single = lines[0]
-            segs = re.split(r"[,;\|]", single)
-            split_topics = []
-            for s in segs:
-                s2 = re.sub(r"[^\w\s-]", "", s).strip()
-                if s2:
-                    split_topics.append(s2)
-            if split_topics:
-                topics = split_topics
-        # Deduplicate while preserving order
-        seen = set()
-        deduped = []
-        for t in topics:
-            if t.lower() in seen:
-                continue
-            seen.add(t.lower())
-            deduped.append(t)
-        return deduped[:n]
+        return fetch_trending_niches(n)
     except Exception as e:
         logging.error("❌ Error suggesting trending topics: %s", e)
         # Stub fallback
@@ -206,6 +314,69 @@ def suggest_trending_niches(count: int = 5) -> List[str]:
         return stub[:n]
 
 
+def fetch_trending_niches(n: int) -> List[str]:
+    """Ask Gemini for n trending topics, most relevant first.
+
+    Unlike suggest_trending_niches there is no stub fallback: request and parse errors
+    propagate, so callers that keep their own copy (the trending pool) can tell a real
+    answer from a failure.
+    """
+    prompt = (
+        "List top trending short-form video topics. "
+        f"Return ONLY a compact JSON array of {n} strings, no markdown, no extra text. "
+        "Keep each item short (3-5 words), safe, and platform-appropriate."
+    )
+    headers = {'Content-Type': 'application/json'}
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    resp = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=25)
+    resp.raise_for_status()
+    data = resp.json()
+    text = data['candidates'][0]['content']['parts'][0]['text']
+    # Prefer a JSON array; fallback to line-based parsing
+    arr_match = re.search(r"\[.*\]", text, re.DOTALL)
+    if arr_match:
+        raw = arr_match.group(0)
+        arr = json.loads(raw)
+        topics = [
+            re.sub(r"[^\w\s-]", "", str(x)).strip()
+            for x in arr
+            if str(x).strip()
+        ]
+        topics = [t for t in topics if t]
+        return topics[:n] if topics else []
+    # Fallback: split lines
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    topics: List[str] = []
+    for ln in lines:
+        # strip bullets, punctuation
+        t = re.sub(r"^[\-\*\d\.]+\s*", "", ln)
+        t = re.sub(r"[^\w\s-]", "", t).strip()
+        if t:
+            topics.append(t)
+        if len(topics) >= n:
+            break
+    # If model returned a single comma-separated line, split by commas/semicolons/pipes
+    if len(topics) <= 1 and lines:
+        single = lines[0]
+        segs = re.split(r"[,;\|]", single)
+        split_topics = []
+        for s in segs:
+            s2 = re.sub(r"[^\w\s-]", "", s).strip()
+            if s2:
+                split_topics.append(s2)
+        if split_topics:
+            topics = split_topics
+    # Deduplicate while preserving order
+    seen = set()
+    deduped = []
+    for t in topics:
+        if t.lower() in seen:
+            continue
+        seen.add(t.lower())
+        deduped.append(t)
+    return deduped[:n]
+
+
 def _stub_idea(niche: str, error: str | None = None) -> dict:
     """Return a deterministic stub idea structure so downstream stages can proceed.
 
@@ -3,12 +3,18 @@ import re
 import requests
 import logging
 import os
-from app.config import GEMINI_API_KEY
+from typing import Iterator
+from app.config import GEMINI_API_KEY, GEMINI_API_BASE
+from app.stages.stage_1_idea_engine import _valid_idea, cache_idea, generate_video_idea
 
 # Allow overriding model; default to a model commonly available to AI Studio keys.
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_API_URL_TEMPLATE = (
-    "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key="
+    GEMINI_API_BASE + "/models/{model}:generateContent?key="
+    + GEMINI_API_KEY
+)
+GEMINI_STREAM_URL_TEMPLATE = (
+    GEMINI_API_BASE + "/models/{model}:streamGenerateContent?alt=sse&key="
     + GEMINI_API_KEY
 )
 
@@ -19,6 +25,9 @@ DEV_FALLBACK_MODE = (
     or (isinstance(GEMINI_MODEL, str) and GEMINI_MODEL.startswith("stub_"))
 )
 
+# The script prompts ask for 5 to 7 scenes; a script with fewer was cut short or ignored the prompt.
+MIN_SCRIPT_SCENES = 5
+
 
 def build_script_prompt(video_idea: dict) -> str:
     """Build the default Stage 2 scriptwriter prompt from a video_idea.
@@ -133,6 +142,199 @@ def run_scriptwriter(
         return _stub_script(video_idea)
 
 
+def build_fused_prompt(niche: str) -> str:
+    """Prompt asking for the Stage 1 idea and the Stage 2 scenes in one JSON answer."""
+    return f"""You are a social media expert and DeepResearch-ScriptWriter, specialized in viral short-form video for TikTok, Reels, and YouTube Shorts.
+    Develop a complete video concept for the niche: {niche}, then turn it into a structured, viral-ready script.
+    Keep the tone informal (TikTok-style), yet natural and engaging; pacing fast, punchy and dynamic.
+
+    Concept ("idea"):
+    - "title": A short, catchy title in Title Case.
+    - "hook": A strong, one-sentence opening line that immediately grabs attention.
+    - "description": A brief post description including 3-5 relevant hashtags.
+    - "points": 3 to 5 key points or facts that form the main content.
+    - "cta": A clear, concise call-to-action.
+
+    Script ("scenes"):
+    1. Produce exactly 5 to 7 scenes total.
+    2. Scene 1 narration is the hook; the middle scenes turn each key point, in order, into a visually distinct micro-story; the final scene narration is the call to action.
+    3. For every scene include "visual" (a vivid, cinematic description with clear action/motion, suitable for AI generation) and "narration" (an engaging voiceover line, max 15 words).
+    4. No filler, no generic advice, no repeated lines.
+
+    Respond only with a single minified JSON object with the structure:
+    {{"idea": {{"title": "...", "hook": "...", "description": "...", "points": ["..."], "cta": "..."}}, "scenes": [{{"visual": "...", "narration": "..."}}, ...]}}
+    Do NOT include any markdown, code blocks, or explanatory text.
+    """
+
+
+def _parse_fused(data) -> tuple[dict, list] | None:
+    """Return (idea, scenes) when a fused answer has every field downstream stages use.
+
+    The idea must pass Stage 1's _valid_idea and the script needs at least MIN_SCRIPT_SCENES
+    scenes, the same bar a streamed script has to clear.
+    """
+    if not isinstance(data, dict):
+        return None
+    idea, scenes = data.get("idea"), data.get("scenes")
+    if not _valid_idea(idea) or not isinstance(scenes, list) or len(scenes) < MIN_SCRIPT_SCENES:
+        return None
+    if not all(isinstance(sc, dict) and sc.get("visual") and sc.get("narration") for sc in scenes):
+        return None
+    return idea, scenes
+
+
+def generate_idea_and_script(niche: str, model: str | None = None, fresh: bool = False) -> tuple[dict, dict | None]:
+    """Fused Stage 1 + 2: one Gemini call returning both the idea and the script.
+
+    Returns (idea, script) with the same shapes generate_video_idea and
+    generate_video_script produce; script["_prompt"] is the regular Stage 2 prompt for the
+    idea, so the prompt editor keeps working. The idea is stored in the Stage 1 idea cache
+    like any other. When the fused call fails or its answer is incomplete, the idea comes
+    from generate_video_idea (honouring fresh) and script is None, so the caller runs
+    Stage 2 separately as usual.
+    """
+    logging.info("--- Stage 1+2: Fused idea + script ---")
+    niche_clean = " ".join(str(niche or "").split())
+    if DEV_FALLBACK_MODE or not niche_clean:
+        return generate_video_idea(niche, fresh=fresh), None
+
+    api_url = GEMINI_API_URL_TEMPLATE.format(model=model or GEMINI_MODEL)
+    headers = {"Content-Type": "application/json"}
+    payload = {
+        "contents": [{"parts": [{"text": build_fused_prompt(niche_clean)}]}],
+        "generationConfig": {
+            "response_mime_type": "application/json",
+        },
+    }
+    try:
+        response = requests.post(api_url, headers=headers, json=payload, timeout=90)
+        response.raise_for_status()
+        text = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+        parsed = _parse_fused(json.loads(text))
+        if parsed is None:
+            raise ValueError("fused answer is missing idea or scene fields")
+    except Exception as e:
+        logging.error("❌ Fused idea+script generation failed (%s); falling back to separate stages", e)
+        return generate_video_idea(niche, fresh=fresh), None
+    idea, scenes = parsed
+    if model is None:
+        # Idea cache keys use the default model; ideas from an override model stay uncached.
+        cache_idea(niche_clean, idea)
+    logging.info("✅ Idea and script generated in one request (%d scenes).", len(scenes))
+    return idea, {"scenes": scenes, "_prompt": build_script_prompt(idea)}
+
+
+class SceneStreamParser:
+    """Incremental parser for {"scenes": [{...}, ...]} arriving as arbitrary text chunks.
+
+    feed() scans only the new text, tracking strings/escapes and bracket depth, and returns
+    every scene object of the "scenes" array that was completed by this chunk. Text outside
+    that array (other keys, markdown fences) is skipped. complete turns True once the
+    array's closing bracket has been read.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._scenes_depth = None  # bracket depth inside the scenes array
+        self._obj_start = None
+        self.complete = False
+
+    def feed(self, chunk: str) -> list:
+        self._buf += chunk
+        scenes = []
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = buf[self._string_start:i]
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif c in "{[":
+                if c == "[" and self._scenes_depth is None and self._last_string == "scenes":
+                    self._scenes_depth = self._depth + 1
+                elif c == "{" and self._scenes_depth is not None and self._depth == self._scenes_depth:
+                    self._obj_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._obj_start is not None and self._depth == self._scenes_depth:
+                    try:
+                        scenes.append(json.loads(buf[self._obj_start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        logging.debug("Skipping unparsable streamed scene: %s", e)
+                    self._obj_start = None
+                elif c == "]" and self._scenes_depth is not None and self._depth == self._scenes_depth - 1:
+                    self._scenes_depth = None
+                    self.complete = True
+            elif c not in " \t\r\n:":
+                self._last_string = None
+        self._pos = len(buf)
+        return scenes
+
+
+def stream_script_scenes(
+    video_idea: dict,
+    override_prompt: str | None = None,
+    model: str | None = None,
+) -> Iterator[dict]:
+    """Streaming Stage 2: yield each {"visual", "narration"} scene as soon as Gemini has written it.
+
+    Uses streamGenerateContent (server-sent events) and SceneStreamParser, so Stage 3 can
+    fetch media for scene 1 while later scenes are still being generated. Request and
+    stream errors propagate to the caller; in dev fallback mode the stub script is yielded.
+    A stream that ends before the scenes array is closed, or with fewer than
+    MIN_SCRIPT_SCENES scenes, raises ValueError after the scenes it did yield.
+    """
+    logging.info("--- Stage 2: Scriptwriter (streaming) ---")
+    prompt = override_prompt if override_prompt is not None else build_script_prompt(video_idea)
+    if DEV_FALLBACK_MODE:
+        logging.warning("Dev fallback active for Stage 2 — streaming stub script.")
+        yield from _stub_script(video_idea)["scenes"]
+        return
+    api_url = GEMINI_STREAM_URL_TEMPLATE.format(model=model or GEMINI_MODEL)
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "response_mime_type": "application/json",
+        },
+    }
+    parser = SceneStreamParser()
+    yielded = 0
+    with requests.post(api_url, headers={"Content-Type": "application/json"}, json=payload, stream=True, timeout=(10, 90)) as response:
+        response.raise_for_status()
+        # text/event-stream carries no charset, so requests would fall back to ISO-8859-1.
+        response.encoding = "utf-8"
+        # chunk_size=None hands over each network read as it arrives instead of buffering 512 bytes.
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            for candidate in event.get("candidates") or []:
+                for part in (candidate.get("content") or {}).get("parts") or []:
+                    for scene in parser.feed(part.get("text", "")):
+                        if isinstance(scene, dict) and scene.get("visual") and scene.get("narration"):
+                            yielded += 1
+                            yield scene
+    if not parser.complete:
+        raise ValueError(f"script stream ended before the scenes array was complete ({yielded} scenes)")
+    if yielded < MIN_SCRIPT_SCENES:
+        raise ValueError(f"script stream produced only {yielded} scenes (need {MIN_SCRIPT_SCENES})")
+
+
 def generate_video_script(video_idea: dict) -> dict:
     """Backwards-compatible entry point used by the pipeline.
 
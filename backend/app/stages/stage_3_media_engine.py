@@ -2,15 +2,34 @@ import os
 import requests
 import logging
 import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable
+from contextlib import contextmanager
 from app.config import (
     PEXELS_API_KEY,
     ELEVENLABS_API_KEY,
     MEDIA_SOURCE,
-    STABLE_VIDEO_SERVER_URL,
-    STABLE_VIDEO_POLL_INTERVAL,
-    STABLE_VIDEO_MAX_POLL,
     TTS_SOURCE,
+    STAGE3_WORKERS,
+    PEXELS_MAX_CONCURRENCY,
+    ELEVENLABS_MAX_CONCURRENCY,
+    MEDIA_TARGET_WIDTH,
+    MEDIA_TARGET_HEIGHT,
+    PEXELS_SEARCH_CACHE_DIR,
+    PEXELS_SEARCH_CACHE_TTL,
+    PEXELS_SEARCH_CACHE_MAX_BYTES,
+    TTS_CACHE_DIR,
+    TTS_CACHE_MAX_BYTES,
+    ELEVENLABS_API_BASE,
+    TTS_BATCH,
+    SYNTHETIC_CACHE_DIR,
+    SYNTHETIC_CACHE_MAX_BYTES,
 )
+from app.services.file_cache import FileCache, JsonCache, materialize
+from app.services.local_tts import get_local_tts_worker, convert_wavs_to_mp3
+from app.services.svd_client import get_svd_client
+from app.services import media_probe, toolchain
 
 DEV_FALLBACK_MODE = (
     os.getenv("AUTOVIDAI_DEV_MODE", "").lower() in {"1", "true", "yes"}
@@ -21,6 +40,39 @@ DEV_FALLBACK_MODE = (
 # Allow placeholders in Stage 3 even in prod to avoid total pipeline failure if a single provider fails
 ALLOW_PLACEHOLDER = os.getenv("STAGE3_ALLOW_PLACEHOLDER", "1").lower() in {"1", "true", "yes"}
 
+# Process-wide caps on in-flight requests per provider, shared by every concurrent pipeline run,
+# so the Stage 3 worker pool never exceeds provider rate limits. Local TTS runs in one worker
+# process that serves a single batch at a time: 1 slot.
+_PROVIDER_SLOTS = {
+    "pexels": threading.BoundedSemaphore(PEXELS_MAX_CONCURRENCY),
+    "elevenlabs": threading.BoundedSemaphore(ELEVENLABS_MAX_CONCURRENCY),
+    "local_tts": threading.BoundedSemaphore(1),
+}
+
+# Pexels search results shared across runs; repeated niches collapse to the same simplified query.
+_PEXELS_SEARCH_CACHE = JsonCache(
+    "pexels_search", PEXELS_SEARCH_CACHE_DIR, PEXELS_SEARCH_CACHE_MAX_BYTES, PEXELS_SEARCH_CACHE_TTL
+)
+
+# Synthesized narration shared across runs, keyed by text + TTS source + voice parameters.
+_TTS_CACHE = FileCache("tts", TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+
+# Solid-color backgrounds for synthetic fallback clips (few distinct entries, encoded once each).
+_SYNTHETIC_CACHE = FileCache("synthetic", SYNTHETIC_CACHE_DIR, SYNTHETIC_CACHE_MAX_BYTES)
+_synthetic_lock = threading.Lock()
+
+ELEVENLABS_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+ELEVENLABS_MODEL_ID = "eleven_monolingual_v1"
+ELEVENLABS_VOICE_SETTINGS = {'stability': 0.5, 'similarity_boost': 0.75}
+# Local pyttsx3 speaks slightly faster than its default rate for short-form pacing.
+LOCAL_TTS_RATE_FACTOR = 1.05
+
+@contextmanager
+def _provider_slot(provider: str):
+    slot = _PROVIDER_SLOTS[provider]
+    with slot:
+        yield
+
 def _simplify_query(q: str) -> str:
     q = q or ""
     # Remove known prefixes and keep first 5 words for better Pexels matching
@@ -28,36 +80,94 @@ def _simplify_query(q: str) -> str:
     words = q.split()
     return " ".join(words[:5]) or "nature"
 
-def get_video_from_pexels(query: str, scene_index: int) -> dict:
+def _estimate_scene_duration(narration: str) -> float:
+    """Rough narration length (2.5 words/s, min 3s), matching the renderer's timeline heuristic."""
+    return max(len((narration or "").split()) / 2.5, 3.0)
+
+def _select_pexels_rendition(videos: list, target_w: int, target_h: int, min_duration: float | None = None) -> dict | None:
+    """Pick the cheapest Pexels rendition that still covers the render target.
+
+    Preference order: orientation matching the target, source duration >= min_duration,
+    then the smallest file whose fitted size reaches the target box (no upscaling). When
+    nothing reaches the target, the largest available rendition wins. Returns the chosen
+    video_file dict augmented with the parent video's duration, or None.
+    """
+    target_landscape = target_w >= target_h
+    best_key, best = None, None
+    for order, video in enumerate(videos):
+        duration = video.get("duration") or 0
+        for vf in video.get("video_files", []):
+            w, h = vf.get("width") or 0, vf.get("height") or 0
+            if not vf.get("link") or (vf.get("file_type") and vf.get("file_type") != "video/mp4"):
+                continue
+            if not w or not h:
+                # Unknown dimensions: keep only as a last resort.
+                key = (1, 1, 1, 0, order)
+            else:
+                # Scaled to fit (force_original_aspect_ratio=decrease), the clip is not upscaled
+                # as long as one dimension reaches the target box.
+                covers = w >= target_w or h >= target_h
+                key = (
+                    0 if (w >= h) == target_landscape else 1,
+                    0 if (not min_duration or duration >= min_duration) else 1,
+                    0 if covers else 1,
+                    w * h if covers else -(w * h),
+                    order,
+                )
+            if best_key is None or key < best_key:
+                best_key, best = key, {**vf, "duration": duration}
+    return best
+
+def _search_pexels(query: str, orientation: str, per_page: int = 5) -> list:
+    """Return Pexels candidate videos for a query, served from the search cache when fresh.
+
+    Only the fields rendition selection needs are kept. Concurrent identical searches share
+    one in-flight request; request errors propagate and are not cached.
+    """
+    import hashlib
+    key = hashlib.sha256(f"{query.strip().lower()}|{orientation}|{per_page}".encode()).hexdigest()
+
+    def fetch() -> list:
+        headers = {'Authorization': PEXELS_API_KEY}
+        params = {'query': query, 'per_page': per_page, 'orientation': orientation}
+        response = requests.get('https://api.pexels.com/videos/search', headers=headers, params=params, timeout=(5, 15))
+        response.raise_for_status()
+        return [
+            {
+                "id": v.get("id"),
+                "duration": v.get("duration"),
+                "video_files": [
+                    {k: vf.get(k) for k in ("link", "width", "height", "file_type", "quality")}
+                    for vf in v.get("video_files", [])
+                ],
+            }
+            for v in response.json().get("videos") or []
+        ]
+
+    return _PEXELS_SEARCH_CACHE.get_or_fetch(key, fetch)
+
+def get_video_from_pexels(query: str, scene_index: int, min_duration: float | None = None) -> dict:
     print(f"  - Searching Pexels for video: '{query}'")
     if DEV_FALLBACK_MODE:
         # Return a public sample video URL suitable for testing.
         url = "https://www.w3schools.com/html/mov_bbb.mp4"
         print(f"    -> ⚙️ Dev fallback video: {url}")
         return {"video_url": url, "fallback": True}
-    headers = {'Authorization': PEXELS_API_KEY}
     # Try simplified query first with a few candidates
     simple = _simplify_query(query)
-    params = {'query': simple,'per_page': 5}
+    orientation = "landscape" if MEDIA_TARGET_WIDTH >= MEDIA_TARGET_HEIGHT else "portrait"
     try:
-        response = requests.get('https://api.pexels.com/videos/search', headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        if data.get('videos'):
-            # Prefer vertical HD then any HD then first available
-            for video in data['videos']:
-                video_files = video.get('video_files', [])
-                # vertical hd
-                for vf in video_files:
-                    if vf.get('quality') == 'hd' and vf.get('width',0) < vf.get('height',0):
-                        url = vf.get('link'); print(f"    -> ✅ Found vertical HD: {url}"); return {"video_url": url}
-                # any hd
-                for vf in video_files:
-                    if vf.get('quality') == 'hd':
-                        url = vf.get('link'); print(f"    -> ✅ Found HD: {url}"); return {"video_url": url}
-                # any
-                if video_files:
-                    url = video_files[0].get('link'); print(f"    -> ✅ Found video: {url}"); return {"video_url": url}
+        videos = _search_pexels(simple, orientation)
+        rendition = _select_pexels_rendition(videos, MEDIA_TARGET_WIDTH, MEDIA_TARGET_HEIGHT, min_duration)
+        if rendition:
+            url = rendition.get('link')
+            print(f"    -> ✅ Found {rendition.get('width')}x{rendition.get('height')} ({rendition.get('duration')}s): {url}")
+            return {
+                "video_url": url,
+                "width": rendition.get('width'),
+                "height": rendition.get('height'),
+                "source_duration": rendition.get('duration'),
+            }
         print(f"    -> ⚠️ No suitable video found on Pexels for query: '{query}'")
         if ALLOW_PLACEHOLDER:
             url = "https://www.w3schools.com/html/mov_bbb.mp4"
@@ -72,86 +182,136 @@ def get_video_from_pexels(query: str, scene_index: int) -> dict:
             return {"video_url": url, "placeholder": True}
         return {"error": "Pexels API request failed", "details": str(e)}
 
-def _generate_silent_audio(scene_index: int, duration: float = 1.0) -> str:
-    """Generate a proper silent AAC/mp3 audio file instead of a placeholder stub.
+# Per-scene outputs go here unless the caller passes a run's own work_dir.
+_DEFAULT_WORK_DIR = "temp"
+_SILENCE_DIR = os.path.join("temp", "cache", "silence")
+_silence_files: dict[tuple, str] = {}
+_silence_lock = threading.Lock()
+
+def _generate_silent_audio(duration: float = 1.0, sample_rate: int = 44100, channels: int = 2) -> str:
+    """Return a silent 16-bit PCM WAV of the given length, written in-process.
 
-    Uses ffmpeg anullsrc if available; falls back to tiny placeholder bytes otherwise.
+    Files are shared per (duration, sample_rate, channels) under temp/cache/silence, so
+    repeated placeholders reuse one file and fallback paths never spawn ffmpeg. Raises
+    OSError when the file cannot be written; a path is only ever returned once it exists.
     """
-    os.makedirs("temp", exist_ok=True)
-    audio_filename = f"temp/audio_scene_{scene_index}.mp3"
-    try:
-        # Prefer ffmpeg if installed
-        if subprocess.run(["which", "ffmpeg"], capture_output=True).returncode == 0:
-            subprocess.run([
-                "ffmpeg", "-y",
-                "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
-                "-t", f"{duration:.2f}",
-                "-q:a", "5",
-                audio_filename
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:
-            # Fallback tiny valid-ish MP3 header (still silence-ish)
-            with open(audio_filename, 'wb') as f:
-                f.write(b"ID3\x04\x00\x00\x00\x00\x00\x0Fsilence")
-    except Exception as e:
-        logging.warning("Silent audio generation failed: %s", e)
-        # Last resort placeholder
-        with open(audio_filename, 'wb') as f:
-            f.write(b"ID3\x04\x00\x00\x00\x00\x00\x0Ffallback")
-    return audio_filename
+    import wave
+    frames = max(1, round(duration * sample_rate))
+    key = (frames, sample_rate, channels)
+    with _silence_lock:
+        path = _silence_files.get(key)
+        if path and os.path.exists(path):
+            return path
+        os.makedirs(_SILENCE_DIR, exist_ok=True)
+        path = os.path.join(_SILENCE_DIR, f"silence_{frames}_{sample_rate}_{channels}.wav")
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.part"
+            try:
+                with wave.open(tmp, "wb") as w:
+                    w.setnchannels(channels)
+                    w.setsampwidth(2)
+                    w.setframerate(sample_rate)
+                    chunk = b"\x00" * (2 * channels * min(frames, sample_rate))
+                    remaining = frames
+                    while remaining > 0:
+                        n = min(remaining, sample_rate)
+                        w.writeframes(chunk[: 2 * channels * n])
+                        remaining -= n
+                os.replace(tmp, path)
+            except OSError as e:
+                logging.warning("Silent audio generation failed: %s", e)
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+        _silence_files[key] = path
+        return path
 
-def _tts_local_engine(text: str, scene_index: int) -> dict:
-    """Generate narration using local TTS engine (pyttsx3).
+def _unlink_output(path: str) -> None:
+    """Remove a previous per-scene output before rewriting it.
 
-    Produces a WAV then converts to MP3 if ffmpeg available; else leaves WAV.
-    Returns audio_path pointing to resulting file.
+    TTS cache hits are hardlinked into the work dir; writing through such a link (open
+    "wb", ffmpeg -y) would silently rewrite the cache entry as well.
     """
+    if os.path.lexists(path):
+        os.remove(path)
+
+def _tts_local_synthesize(jobs: list, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
+    """Generate narration for [(scene_index, text), ...] using the local TTS engine (pyttsx3).
+
+    All lines go to the persistent local TTS worker in one batch, then every WAV is
+    converted to MP3 by a single ffmpeg call (WAV is kept if ffmpeg is unavailable).
+    Returns {scene_index: audio result}; failed lines fall back to silence.
+    """
+    import importlib.util
+    if importlib.util.find_spec("pyttsx3") is None:
+        logging.warning("pyttsx3 not available (falling back to silence)")
+        return {i: {"audio_path": _generate_silent_audio(), "fallback": True} for i, _ in jobs}
+    os.makedirs(work_dir, exist_ok=True)
+    wav_jobs = [(i, text, os.path.join(work_dir, f"audio_scene_{i}.wav")) for i, text in jobs]
+    for i, _, wav_path in wav_jobs:
+        _unlink_output(wav_path)
+        _unlink_output(os.path.join(work_dir, f"audio_scene_{i}.mp3"))
     try:
-        import pyttsx3  # lightweight, offline
-    except Exception as e:
-        logging.warning("pyttsx3 not available: %s (falling back to silence)", e)
-        return {"audio_path": _generate_silent_audio(scene_index), "fallback": True}
-    os.makedirs("temp", exist_ok=True)
-    wav_path = f"temp/audio_scene_{scene_index}.wav"
-    engine = pyttsx3.init()
-    # Slightly faster speech for short-form pacing
-    rate = engine.getProperty('rate')
-    try:
-        engine.setProperty('rate', int(rate * 1.05))
-    except Exception:
-        pass
-    try:
-        engine.save_to_file(text, wav_path)
-        engine.runAndWait()
+        errors = get_local_tts_worker(LOCAL_TTS_RATE_FACTOR).synthesize(wav_jobs)
     except Exception as e:
         logging.warning("Local TTS generation failed: %s", e)
-        return {"audio_path": _generate_silent_audio(scene_index), "fallback": True}
-    # Convert to mp3 if ffmpeg exists
-    mp3_path = f"temp/audio_scene_{scene_index}.mp3"
-    if subprocess.run(["which", "ffmpeg"], capture_output=True).returncode == 0:
-        try:
-            subprocess.run(["ffmpeg", "-y", "-i", wav_path, "-codec:a", "libmp3lame", "-qscale:a", "4", mp3_path],
-                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return {"audio_path": mp3_path, "local_tts": True}
-        except Exception as e:
-            logging.warning("ffmpeg mp3 conversion failed: %s", e)
-            return {"audio_path": wav_path, "local_tts": True, "format": "wav"}
-    return {"audio_path": wav_path, "local_tts": True, "format": "wav"}
+        errors = {i: str(e) for i, _ in jobs}
+    results, converted = {}, []
+    for i, _, wav_path in wav_jobs:
+        if errors.get(i):
+            logging.warning("Local TTS failed for scene %s: %s", i + 1, errors[i])
+            results[i] = {"audio_path": _generate_silent_audio(), "fallback": True}
+        else:
+            converted.append((i, wav_path, os.path.join(work_dir, f"audio_scene_{i}.mp3")))
+    if convert_wavs_to_mp3([(wav_path, mp3_path) for _, wav_path, mp3_path in converted]):
+        for i, _, mp3_path in converted:
+            results[i] = {"audio_path": mp3_path, "local_tts": True}
+    else:
+        for i, wav_path, _ in converted:
+            results[i] = {"audio_path": wav_path, "local_tts": True, "format": "wav"}
+    return results
+
+def _tts_local_engine(text: str, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
+    """Generate narration for a single scene using the local TTS worker."""
+    return _tts_local_synthesize([(scene_index, text)], work_dir)[scene_index]
+
+def _tts_local_batch(scenes: list, work_dir: str = _DEFAULT_WORK_DIR) -> list:
+    """Narrate every scene with one local TTS worker batch and one ffmpeg conversion.
+
+    Lines already in the TTS cache are reused; only the misses reach the engine.
+    Returns per-scene audio results in scene order.
+    """
+    results = [None] * len(scenes)
+    misses = []
+    for i, scene in enumerate(scenes):
+        text = scene.get("narration", "")
+        results[i] = _tts_cache_fetch(text, i, work_dir)
+        if results[i] is None:
+            misses.append((i, text))
+    if misses:
+        print(f"  - Generating local TTS audio for {len(misses)} scenes in one batch")
+        synthesized = _tts_local_synthesize(misses, work_dir)
+        for i, text in misses:
+            results[i] = synthesized[i]
+            _tts_cache_store(text, results[i])
+    return results
 
-def _tts_elevenlabs(text: str, scene_index: int) -> dict:
+def _tts_elevenlabs(text: str, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
     if DEV_FALLBACK_MODE or not ELEVENLABS_API_KEY:
-        audio_filename = _generate_silent_audio(scene_index)
+        audio_filename = _generate_silent_audio()
         print(f"    -> ⚙️ Dev/placeholder silent audio: {audio_filename}")
         return {"audio_path": audio_filename, "fallback": True}
-    voice_id = "21m00Tcm4TlvDq8ikWAM"
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    url = f"{ELEVENLABS_API_BASE}/v1/text-to-speech/{ELEVENLABS_VOICE_ID}"
     headers = {'Accept': 'audio/mpeg','Content-Type': 'application/json','xi-api-key': ELEVENLABS_API_KEY}
-    payload = {'text': text,'model_id': 'eleven_monolingual_v1','voice_settings': {'stability': 0.5,'similarity_boost': 0.75}}
+    payload = {'text': text,'model_id': ELEVENLABS_MODEL_ID,'voice_settings': ELEVENLABS_VOICE_SETTINGS}
     try:
         response = requests.post(url, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
-        os.makedirs('temp', exist_ok=True)
-        audio_filename = f"temp/audio_scene_{scene_index}.mp3"
+        os.makedirs(work_dir, exist_ok=True)
+        audio_filename = os.path.join(work_dir, f"audio_scene_{scene_index}.mp3")
+        _unlink_output(audio_filename)
         with open(audio_filename, 'wb') as f: f.write(response.content)
         print(f"    -> ✅ TTS audio saved: {audio_filename}")
         return {"audio_path": audio_filename}
@@ -160,132 +320,406 @@ def _tts_elevenlabs(text: str, scene_index: int) -> dict:
         if hasattr(e, 'response') and e.response is not None:
             print(f"      -> Response: {e.response.text}")
         if ALLOW_PLACEHOLDER:
-            audio_filename = _generate_silent_audio(scene_index)
+            audio_filename = _generate_silent_audio()
             print(f"    -> 🔁 Using silent placeholder audio: {audio_filename}")
             return {"audio_path": audio_filename, "placeholder": True}
         return {"error": "ElevenLabs API request failed", "details": str(e)}
 
-def get_audio(text: str, scene_index: int) -> dict:
+def _tts_cache_key(text: str) -> str:
+    """Key narration audio by text, TTS_SOURCE and every parameter that shapes the voice."""
+    import hashlib, json
+    if TTS_SOURCE == 'local':
+        params = {"rate_factor": LOCAL_TTS_RATE_FACTOR}
+    else:
+        params = {"voice_id": ELEVENLABS_VOICE_ID, "model_id": ELEVENLABS_MODEL_ID, "voice_settings": ELEVENLABS_VOICE_SETTINGS}
+    raw = json.dumps({"text": text, "source": TTS_SOURCE, **params}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _tts_cache_fetch(text: str, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict | None:
+    """Return a cached narration result hardlinked at <work_dir>/audio_scene_{i}, or None."""
+    if TTS_CACHE_MAX_BYTES <= 0 or not (text or "").strip():
+        return None
+    key = _tts_cache_key(text)
+    # Local TTS may have produced WAV when ffmpeg was missing; ElevenLabs is always MP3.
+    ext = ".wav" if os.path.exists(_TTS_CACHE.path_for(key, ".wav")) else ".mp3"
+    cached = _TTS_CACHE.lookup(key, ext)
+    if not cached:
+        return None
+    os.makedirs(work_dir, exist_ok=True)
+    # The work dir belongs to this run and TTS writers unlink before writing, so a link is safe.
+    audio_path = materialize(cached, os.path.join(work_dir, f"audio_scene_{scene_index}{ext}"))
+    print(f"    -> ♻️ TTS cache hit: {audio_path}")
+    return {"audio_path": audio_path, "cached": True}
+
+def _tts_cache_store(text: str, result: dict) -> None:
+    # Only cache real synthesized speech, never silent fallbacks or placeholders.
+    if TTS_CACHE_MAX_BYTES <= 0 or not (text or "").strip() or not result.get("audio_path"):
+        return
+    if any(result.get(k) for k in ("error", "fallback", "placeholder")):
+        return
+    ext = os.path.splitext(result["audio_path"])[1] or ".mp3"
+    _TTS_CACHE.store(_tts_cache_key(text), result["audio_path"], ext)
+
+def get_audio(text: str, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
     print(f"  - Generating TTS audio (source={TTS_SOURCE}) for: '{text[:50]}...'")
+    cached = _tts_cache_fetch(text, scene_index, work_dir)
+    if cached:
+        return cached
     if TTS_SOURCE == 'local':
-        return _tts_local_engine(text, scene_index)
-    return _tts_elevenlabs(text, scene_index)
+        result = _tts_local_engine(text, scene_index, work_dir)
+    else:
+        result = _tts_elevenlabs(text, scene_index, work_dir)
+    _tts_cache_store(text, result)
+    return result
+
+def _scene_boundaries(texts: list, separator: str, alignment: dict) -> list | None:
+    """Map each text's character span in the joined narration to (start, end) seconds.
 
-def _svd_generate(prompt: str, scene_index: int) -> dict:
-    """Attempt to generate a video clip via a local Stable Video Diffusion server.
+    Cuts fall midway between the last character of one scene and the first of the next,
+    so pauses are shared rather than clipped. The final scene's end is None (end of
+    audio). Returns None when the alignment doesn't line up with the request text.
+    """
+    starts = alignment.get("character_start_times_seconds") or []
+    ends = alignment.get("character_end_times_seconds") or []
+    joined_len = sum(len(t) for t in texts) + len(separator) * (len(texts) - 1)
+    if len(starts) != joined_len or len(ends) != joined_len:
+        return None
+    spans, offset = [], 0
+    for text in texts:
+        spans.append((offset, offset + len(text) - 1))
+        offset += len(text) + len(separator)
+    bounds = []
+    for i, (first, last) in enumerate(spans):
+        start = 0.0 if i == 0 else bounds[-1][1]
+        if i == len(spans) - 1:
+            end = None
+        else:
+            end = (ends[last] + starts[spans[i + 1][0]]) / 2.0
+        bounds.append((start, end))
+    return bounds
+
+def _tts_elevenlabs_batch(scenes: list, work_dir: str = _DEFAULT_WORK_DIR) -> list | None:
+    """Synthesize the whole script in one ElevenLabs with-timestamps request.
+
+    The character alignment in the response is used to cut the audio at scene boundaries
+    (one ffmpeg process, one decode) into <work_dir>/audio_scene_{i}.mp3, each carrying its
+    measured duration. Returns per-scene audio results in scene order, or None when the
+    batch can't be used so the caller falls back to per-scene requests.
+    """
+    import base64, hashlib
+    if DEV_FALLBACK_MODE or not ELEVENLABS_API_KEY or not toolchain.has_encoder("libmp3lame"):
+        return None
+    texts = [(scene.get("narration") or "").strip() for scene in scenes]
+    spoken = [i for i, t in enumerate(texts) if t]
+    if len(spoken) < 2:
+        return None
+    # Reuse cached lines when every scene is already cached; otherwise synthesize all of them
+    # together so prosody stays consistent across scenes.
+    if TTS_CACHE_MAX_BYTES > 0 and all(os.path.exists(_TTS_CACHE.path_for(_tts_cache_key(texts[i]), ".mp3")) for i in spoken):
+        return None
+    separator = "\n\n"
+    batch_texts = [texts[i] for i in spoken]
+    print(f"  - Generating batched TTS audio for {len(batch_texts)} scenes in one request")
+    url = f"{ELEVENLABS_API_BASE}/v1/text-to-speech/{ELEVENLABS_VOICE_ID}/with-timestamps"
+    headers = {'Content-Type': 'application/json', 'xi-api-key': ELEVENLABS_API_KEY}
+    payload = {'text': separator.join(batch_texts), 'model_id': ELEVENLABS_MODEL_ID, 'voice_settings': ELEVENLABS_VOICE_SETTINGS}
+    try:
+        with _provider_slot("elevenlabs"):
+            response = requests.post(url, headers=headers, json=payload, timeout=90)
+        response.raise_for_status()
+        data = response.json()
+        audio = base64.b64decode(data["audio_base64"])
+        bounds = _scene_boundaries(batch_texts, separator, data.get("alignment") or {})
+    except (requests.RequestException, KeyError, ValueError) as e:
+        logging.warning("Batched ElevenLabs TTS failed (%s); falling back to per-scene requests", e)
+        return None
+    if not bounds:
+        logging.warning("Batched TTS alignment did not match the request text; falling back to per-scene requests")
+        return None
+
+    os.makedirs(work_dir, exist_ok=True)
+    full_path = os.path.join(work_dir, f"audio_script_{hashlib.sha1(payload['text'].encode()).hexdigest()[:12]}.mp3")
+    with open(full_path, "wb") as f:
+        f.write(audio)
+    cmd = ["ffmpeg", "-y", "-i", full_path]
+    out_paths = []
+    for scene_index, (start, end) in zip(spoken, bounds):
+        out = os.path.join(work_dir, f"audio_scene_{scene_index}.mp3")
+        _unlink_output(out)
+        cmd += ["-ss", f"{start:.3f}"]
+        if end is not None:
+            cmd += ["-to", f"{end:.3f}"]
+        cmd += ["-map", "0:a", "-c:a", "libmp3lame", "-q:a", "4", out]
+        out_paths.append(out)
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        logging.warning("Splitting batched TTS audio failed (%s); falling back to per-scene requests", e)
+        return None
+    finally:
+        try:
+            os.remove(full_path)
+        except OSError:
+            pass
+
+    total_end = max(data["alignment"]["character_end_times_seconds"])
+    results = [None] * len(scenes)
+    for scene_index, (start, end), out in zip(spoken, bounds, out_paths):
+        duration = round((end if end is not None else total_end) - start, 3)
+        results[scene_index] = {"audio_path": out, "duration": duration, "batched": True}
+        if TTS_CACHE_MAX_BYTES > 0:
+            _TTS_CACHE.store(_tts_cache_key(texts[scene_index]), out, ".mp3")
+    for i, result in enumerate(results):
+        if result is None:
+            # Empty narration: nothing to say, keep the scene with a short silence.
+            results[i] = {"audio_path": _generate_silent_audio(), "placeholder": True}
+    print(f"    -> ✅ Batched TTS split into {len(spoken)} scene files")
+    return results
+
+def _svd_submit(prompt: str) -> Future | None:
+    """Start a Stable Video Diffusion job on the shared SVD client (None in dev mode)."""
+    if DEV_FALLBACK_MODE:
+        return None
+    return get_svd_client().submit(prompt)
+
+def _svd_generate(prompt: str, scene_index: int, job: Future | None = None) -> dict:
+    """Generate a video clip via a local Stable Video Diffusion server.
 
-    Expected API (simplified pseudo):
-        POST {STABLE_VIDEO_SERVER_URL}/generate {prompt: str} -> {id: str}
-        GET  {STABLE_VIDEO_SERVER_URL}/status/{id} -> {status: str, url: str?}
-    For now, gracefully fallback if server unreachable.
+    The job is submitted here unless `job` was already started by _svd_submit (Stage 3
+    submits every scene up front); the shared client polls all jobs in one thread.
+    Gracefully falls back to a placeholder if the server is unreachable or the job fails.
     """
     if DEV_FALLBACK_MODE:
         # In dev just reuse public sample
         return {"video_url": "https://www.w3schools.com/html/mov_bbb.mp4", "fallback": True}
-    gen_endpoint = STABLE_VIDEO_SERVER_URL.rstrip('/') + '/generate'
     try:
-        r = requests.post(gen_endpoint, json={"prompt": prompt}, timeout=15)
-        if not r.ok:
-            logging.warning("SVD generate non-OK %s: %s", r.status_code, r.text[:120])
-            raise RuntimeError("svd generate failed")
-        job_id = r.json().get("id")
-        if not job_id:
-            raise RuntimeError("svd missing id")
-        status_endpoint = STABLE_VIDEO_SERVER_URL.rstrip('/') + f'/status/{job_id}'
-        polls = 0
-        while polls < STABLE_VIDEO_MAX_POLL:
-            polls += 1
-            sr = requests.get(status_endpoint, timeout=15)
-            if not sr.ok:
-                logging.warning("SVD status non-OK %s", sr.status_code)
-                break
-            payload = sr.json()
-            status = payload.get("status")
-            if status in {"completed", "done"}:
-                url = payload.get("url") or payload.get("video_url")
-                if url:
-                    return {"video_url": url}
-                break
-            if status in {"failed", "error"}:
-                logging.warning("SVD job failed: %s", payload)
-                break
-            import time as _t; _t.sleep(STABLE_VIDEO_POLL_INTERVAL)
+        job = job or _svd_submit(prompt)
+        return {"video_url": job.result()}
     except Exception as e:
-        logging.warning("SVD generation error: %s", e)
+        logging.warning("SVD generation error for scene %s: %s", scene_index + 1, e)
     # Fallback path: return placeholder to allow pipeline continuation
     return {"video_url": "https://www.w3schools.com/html/movie.mp4", "placeholder": True}
 
-def _local_text_clip(narration: str, scene_index: int) -> dict:
-    """Generate a short local synthetic clip with text overlay as last-resort fallback.
-    Requires ffmpeg with drawtext (libfreetype). If drawtext unsupported, a plain color clip is produced.
-    """
-    if subprocess.run(["which", "ffmpeg"], capture_output=True).returncode != 0:
-        return {"video_url": "https://www.w3schools.com/html/mov_bbb.mp4", "fallback": True}
-    os.makedirs("temp", exist_ok=True)
-    out_path = f"temp/synthetic_scene_{scene_index}.mp4"
-    text = (narration[:50] + "…") if narration else f"Scene {scene_index+1}"
-    # Try drawtext; if fails we retry without it
-    base_cmd = [
-        "ffmpeg", "-y",
-        "-f", "lavfi", "-i", "color=c=black:s=720x1280:d=3",
-        "-vf", f"drawtext=text='{text}':fontcolor=white:fontsize=48:x=(w-text_w)/2:y=(h-text_h)/2",
-        "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
-        out_path
-    ]
-    try:
-        subprocess.run(base_cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return {"video_url": out_path, "generated": True}
-    except Exception:
+def _synthetic_background(width: int, height: int, duration: float, color: str = "black") -> str | None:
+    """Return a cached solid-color clip, encoding it only the first time a combination is needed."""
+    import hashlib
+    codec_args = (["-c:v", "libx264", "-preset", "veryfast", "-crf", "30"]
+                  if toolchain.has_encoder("libx264") else ["-c:v", "mpeg4", "-q:v", "5"])
+    key = hashlib.sha256(f"{width}x{height}|{duration:.3f}|{color}|{codec_args}".encode()).hexdigest()
+    with _synthetic_lock:
+        cached = _SYNTHETIC_CACHE.lookup(key, ".mp4")
+        if cached:
+            return cached
+        os.makedirs("temp", exist_ok=True)
+        tmp_path = f"temp/synthetic_bg_{key[:12]}.mp4"
+        cmd = [
+            "ffmpeg", "-y", "-f", "lavfi", "-i", f"color=c={color}:s={width}x{height}:d={duration:.3f}:r=30",
+            *codec_args, "-pix_fmt", "yuv420p", tmp_path,
+        ]
         try:
-            subprocess.run([
-                "ffmpeg", "-y", "-f", "lavfi", "-i", "color=c=black:s=720x1280:d=3",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "30", out_path
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return {"video_url": out_path, "generated": True, "no_text": True}
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         except Exception as e:
-            logging.warning("Local synthetic clip failed: %s", e)
-            return {"video_url": "https://www.w3schools.com/html/mov_bbb.mp4", "fallback": True}
+            logging.warning("Synthetic background encode failed: %s", e)
+            return None
+        return _SYNTHETIC_CACHE.store(key, tmp_path, ".mp4", move=True) or tmp_path
+
+def _local_text_clip(narration: str, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
+    """Build a last-resort synthetic clip: a cached black background plus overlay text.
 
-def generate_media_assets(video_script: dict) -> list:
+    The background is encoded once per (resolution, duration, color); the text is not burned
+    in here but returned as overlay_text, which the local renderer draws during the scene's
+    segment encode (drawtext). Identical texts therefore hit the segment cache as a whole.
+    """
+    if not toolchain.ffmpeg_available():
+        return {"video_url": "https://www.w3schools.com/html/mov_bbb.mp4", "fallback": True}
+    background = _synthetic_background(MEDIA_TARGET_WIDTH, MEDIA_TARGET_HEIGHT, 3.0)
+    if background is None:
+        return {"video_url": "https://www.w3schools.com/html/mov_bbb.mp4", "fallback": True}
+    # A per-scene link keeps the clip usable even if the cache entry is evicted before rendering.
+    os.makedirs(work_dir, exist_ok=True)
+    out_path = materialize(background, os.path.join(work_dir, f"synthetic_scene_{scene_index}.mp4"))
+    result = {"video_url": out_path, "generated": True}
+    if toolchain.has_filter("drawtext"):
+        result["overlay_text"] = (narration[:50] + "…") if narration else f"Scene {scene_index+1}"
+    else:
+        result["no_text"] = True
+    return result
+
+def _svd_prompt(scene: dict) -> str:
+    return scene.get("visual", "") or scene.get("narration", "")
+
+def _fetch_video(scene: dict, scene_index: int, svd_job: Future | None = None) -> dict:
+    """Acquire the video for one scene from the configured MEDIA_SOURCE (provider-limited)."""
+    visual_query = scene.get("visual", "")
+    if MEDIA_SOURCE == "pexels":
+        with _provider_slot("pexels"):
+            return get_video_from_pexels(visual_query, scene_index, _estimate_scene_duration(scene.get("narration", "")))
+    if MEDIA_SOURCE == "svd":
+        # The SVD client caps its own concurrent requests; jobs themselves all run at once.
+        return _svd_generate(_svd_prompt(scene), scene_index, svd_job)
+    return {"error": f"Unsupported MEDIA_SOURCE {MEDIA_SOURCE}"}
+
+def _fetch_audio(scene: dict, scene_index: int, work_dir: str = _DEFAULT_WORK_DIR) -> dict:
+    """Synthesize narration for one scene with the configured TTS_SOURCE (provider-limited)."""
+    with _provider_slot("local_tts" if TTS_SOURCE == "local" else "elevenlabs"):
+        return get_audio(scene.get("narration", ""), scene_index, work_dir)
+
+def _assemble_scene(scene: dict, scene_index: int, video_result: dict, audio_result: dict, work_dir: str = _DEFAULT_WORK_DIR) -> dict | None:
+    """Apply placeholder fallbacks and build the asset entry; None drops the scene."""
+    if "error" in video_result:
+        print(f"  ⚠️ Video acquisition failed for scene {scene_index+1}: {video_result.get('error')}")
+        if ALLOW_PLACEHOLDER:
+            video_result = _local_text_clip(scene.get("narration", ""), scene_index, work_dir)
+        else:
+            return None
+    if "error" in audio_result:
+        print(f"  ⚠️ Audio acquisition failed for scene {scene_index+1}: {audio_result.get('error')}")
+        if ALLOW_PLACEHOLDER:
+            # Replace with silent fallback
+            audio_result = {"audio_path": _generate_silent_audio(), "placeholder": True}
+        else:
+            return None
+    print(f"  ✅ Scene {scene_index+1} assets ready.")
+    asset = {
+        "visual": scene.get("visual", ""),
+        "narration": scene.get("narration", ""),
+        "video_url": video_result["video_url"],
+        "audio_path": audio_result["audio_path"],
+    }
+    if audio_result.get("duration"):
+        asset["audio_duration"] = audio_result["duration"]
+    if audio_result.get("placeholder") or audio_result.get("fallback"):
+        # Silence stand-in: its length says nothing about how long the scene should be.
+        asset["audio_placeholder"] = True
+    if scene.get("video_start") is not None:
+        # Optional script hint: where in the source clip the scene should start (seconds).
+        asset["video_start"] = scene["video_start"]
+    if video_result.get("overlay_text"):
+        asset["overlay_text"] = video_result["overlay_text"]
+    # Rendition metadata reported by the provider (Pexels), when known.
+    for src_key, asset_key in (("width", "video_width"), ("height", "video_height"), ("source_duration", "video_duration")):
+        if video_result.get(src_key):
+            asset[asset_key] = video_result[src_key]
+    return asset
+
+def generate_media_assets(video_script: dict, workers: int | None = None, work_dir: str | None = None) -> list:
     """Generate media assets per scene using selected MEDIA_SOURCE.
 
     MEDIA_SOURCE options:
       pexels - stock footage from Pexels
       svd    - local Stable Video Diffusion server (fallbacks to placeholder if unavailable)
+
+    With workers > 1 (default STAGE3_WORKERS) every scene's video and narration are
+    fetched concurrently, including video and TTS of the same scene; per-provider
+    semaphores keep requests under provider rate limits. Results keep scene order.
+
+    With TTS_BATCH=1 (ElevenLabs only) the whole narration is synthesized in a single
+    request and split per scene; per-scene requests remain the fallback. Local TTS always
+    narrates all scenes in one batch through the persistent local TTS worker.
+
+    With MEDIA_SOURCE=svd every scene's job is submitted before anything else, so the
+    server works on all of them while narration is generated.
+
+    Narration and synthetic clips are written under work_dir (default temp/); the pipeline
+    passes each run its own directory so concurrent runs never share per-scene files.
     """
+    work_dir = work_dir or _DEFAULT_WORK_DIR
+    scenes = video_script.get("scenes", [])
+    total = len(scenes)
+    workers = STAGE3_WORKERS if workers is None else max(1, workers)
+    if total <= 1:
+        tts_batch = None
+    elif TTS_SOURCE == "local":
+        tts_batch = _tts_local_batch
+    else:
+        tts_batch = _tts_elevenlabs_batch if TTS_BATCH else None
+    svd_jobs = [None] * total
+    if MEDIA_SOURCE == "svd" and not DEV_FALLBACK_MODE:
+        print(f"\nSubmitting {total} SVD jobs...")
+        svd_jobs = [_svd_submit(_svd_prompt(scene)) for scene in scenes]
     scenes_with_assets = []
-    total = len(video_script.get("scenes", []))
-    for i, scene in enumerate(video_script.get("scenes", [])):
-        print(f"\nProcessing Scene {i+1}/{total} (media_source={MEDIA_SOURCE})...")
-        visual_query = scene.get("visual", "")
-        # VIDEO selection
-        if MEDIA_SOURCE == "pexels":
-            video_result = get_video_from_pexels(visual_query, i)
-        elif MEDIA_SOURCE == "svd":
-            prompt = visual_query or scene.get("narration", "")
-            video_result = _svd_generate(prompt, i)
-        else:
-            video_result = {"error": f"Unsupported MEDIA_SOURCE {MEDIA_SOURCE}"}
-        if "error" in video_result:
-            print(f"  ⚠️ Video acquisition failed for scene {i+1}: {video_result.get('error')}")
-            if ALLOW_PLACEHOLDER:
-                video_result = _local_text_clip(scene.get("narration", ""), i)
-            else:
+    if workers <= 1 or total <= 1:
+        batch_audio = tts_batch(scenes, work_dir) if tts_batch else None
+        for i, scene in enumerate(scenes):
+            print(f"\nProcessing Scene {i+1}/{total} (media_source={MEDIA_SOURCE})...")
+            video_result = _fetch_video(scene, i, svd_jobs[i])
+            if "error" in video_result and not ALLOW_PLACEHOLDER:
+                print(f"  ⚠️ Video acquisition failed for scene {i+1}: {video_result.get('error')}")
                 continue
-        narration_text = scene.get("narration", "")
-        audio_result = get_audio(narration_text, i)
-        if "error" in audio_result:
-            print(f"  ⚠️ Audio acquisition failed for scene {i+1}: {audio_result.get('error')}")
-            if ALLOW_PLACEHOLDER:
-                # Replace with silent fallback
-                audio_result = {"audio_path": _generate_silent_audio(i), "placeholder": True}
+            audio_result = batch_audio[i] if batch_audio else _fetch_audio(scene, i, work_dir)
+            asset = _assemble_scene(scene, i, video_result, audio_result, work_dir)
+            if asset:
+                scenes_with_assets.append(asset)
+        return media_probe.annotate_assets(scenes_with_assets)
+
+    print(f"\nProcessing {total} scenes concurrently (media_source={MEDIA_SOURCE}, workers={workers})...")
+    # Video and audio jobs are flat, independent tasks so no task ever waits on another in the same pool.
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage3") as pool:
+        batch_future = pool.submit(tts_batch, scenes, work_dir) if tts_batch else None
+        # Submitted SVD jobs are awaited below rather than parking pool threads on them.
+        video_futures = None
+        if not any(svd_jobs):
+            video_futures = [pool.submit(_fetch_video, scene, i) for i, scene in enumerate(scenes)]
+        batch_audio = None
+        if batch_future is not None:
+            try:
+                batch_audio = batch_future.result()
+            except Exception as e:
+                logging.warning("Batched TTS raised: %s", e)
+        audio_futures = None
+        if not batch_audio:
+            audio_futures = [pool.submit(_fetch_audio, scene, i, work_dir) for i, scene in enumerate(scenes)]
+        for i, scene in enumerate(scenes):
+            try:
+                video_result = video_futures[i].result() if video_futures else _fetch_video(scene, i, svd_jobs[i])
+            except Exception as e:
+                video_result = {"error": "Video acquisition raised", "details": str(e)}
+            if batch_audio:
+                audio_result = batch_audio[i]
             else:
-                continue
-        scenes_with_assets.append({
-            "visual": visual_query,
-            "narration": narration_text,
-            "video_url": video_result["video_url"],
-            "audio_path": audio_result["audio_path"],
-        })
-        print(f"  ✅ Scene {i+1} assets ready.")
-    return scenes_with_assets
+                try:
+                    audio_result = audio_futures[i].result()
+                except Exception as e:
+                    audio_result = {"error": "Audio acquisition raised", "details": str(e)}
+            asset = _assemble_scene(scene, i, video_result, audio_result, work_dir)
+            if asset:
+                scenes_with_assets.append(asset)
+    return media_probe.annotate_assets(scenes_with_assets)
+
+def generate_media_assets_stream(scenes: Iterable[dict], workers: int | None = None, work_dir: str | None = None) -> tuple[list, list]:
+    """Generate assets for scenes that are still being written (streaming Stage 2).
+
+    Each scene's video and narration fetches start the moment the iterator yields it, so
+    media acquisition overlaps script generation. Scenes are narrated one request each
+    (the TTS cache still applies); whole-script TTS batching needs every line up front and
+    is skipped. Returns (scenes consumed, assets in scene order); exceptions raised by the
+    iterator propagate after in-flight fetches finish. work_dir is as for generate_media_assets.
+    """
+    work_dir = work_dir or _DEFAULT_WORK_DIR
+    workers = STAGE3_WORKERS if workers is None else max(1, workers)
+    received = []
+    pending = []
+    print(f"\nProcessing streamed scenes as they arrive (media_source={MEDIA_SOURCE}, workers={workers})...")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage3") as pool:
+        for i, scene in enumerate(scenes):
+            received.append(scene)
+            print(f"  - Scene {i+1} received; fetching media")
+            svd_job = _svd_submit(_svd_prompt(scene)) if MEDIA_SOURCE == "svd" and not DEV_FALLBACK_MODE else None
+            pending.append((
+                pool.submit(_fetch_video, scene, i, svd_job),
+                pool.submit(_fetch_audio, scene, i, work_dir),
+            ))
+        scenes_with_assets = []
+        for i, (video_future, audio_future) in enumerate(pending):
+            try:
+                video_result = video_future.result()
+            except Exception as e:
+                video_result = {"error": "Video acquisition raised", "details": str(e)}
+            try:
+                audio_result = audio_future.result()
+            except Exception as e:
+                audio_result = {"error": "Audio acquisition raised", "details": str(e)}
+            asset = _assemble_scene(received[i], i, video_result, audio_result, work_dir)
+            if asset:
+                scenes_with_assets.append(asset)
+    return received, media_probe.annotate_assets(scenes_with_assets)
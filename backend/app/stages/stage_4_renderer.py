@@ -1,7 +1,22 @@
 import time
 import os
 import logging
-from app.config import SHOTSTACK_API_KEY, SHOTSTACK_STAGE, RENDER_BACKEND
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from app.config import (
+    SHOTSTACK_API_KEY,
+    SHOTSTACK_STAGE,
+    RENDER_BACKEND,
+    RENDER_WORKERS,
+    SEGMENT_CACHE_DIR,
+    SEGMENT_CACHE_MAX_BYTES,
+    DOWNLOAD_CACHE_DIR,
+    DOWNLOAD_CACHE_MAX_BYTES,
+    DOWNLOAD_WORKERS,
+)
+from app.services.file_cache import FileCache, file_digest, materialize
+from app.services import media_probe, toolchain
 from shotstack_sdk.api import edit_api
 from shotstack_sdk.model.clip import Clip
 from shotstack_sdk.model.track import Track
@@ -19,27 +34,131 @@ DEV_FALLBACK_MODE = (
     or (not SHOTSTACK_API_KEY) or (isinstance(SHOTSTACK_API_KEY, str) and SHOTSTACK_API_KEY.startswith("dev_"))
 )
 
+# Proxy preview size (RENDER_PREVIEW): small enough to encode within seconds.
+PREVIEW_WIDTH, PREVIEW_HEIGHT = 640, 360
+# The preview encodes alongside the full render, which already sizes itself to every core;
+# a couple of threads keep the proxy quick without starving the real segments.
+PREVIEW_THREADS = 2
+
+_SEGMENT_CACHE = FileCache("segments", SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES)
+_DOWNLOAD_CACHE = FileCache("downloads", DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES)
+# Striped per-URL locks so concurrent segments/prefetch never download the same clip twice;
+# a fixed table keeps memory bounded no matter how many distinct URLs a long-lived server sees.
+_DOWNLOAD_LOCK_STRIPES = 64
+_download_locks = [threading.Lock() for _ in range(_DOWNLOAD_LOCK_STRIPES)]
+
 def _local_ffmpeg_available() -> bool:
-    from shutil import which
-    return which("ffmpeg") is not None
+    return toolchain.ffmpeg_available()
+
+def _render_dir(work_dir: str | None) -> str:
+    """Directory for segments, overlays and the final file: the run's work_dir, else temp/render_local."""
+    temp_dir = work_dir or os.path.join("temp", "render_local")
+    os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
+
+def _download_suffix(url: str) -> str:
+    """File extension for a cached download, taken from the URL path (default .mp4)."""
+    from urllib.parse import urlparse
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    if ext in {".mp4", ".mov", ".webm", ".mkv", ".m4v", ".mp3", ".wav", ".m4a", ".aac"}:
+        return ext
+    return ".mp4"
+
+def _stream_download(url: str, key: str) -> str:
+    """Stream url to a temp file in chunks, validate it, and move it into the download cache.
 
-def _download_if_remote(url: str, dest_dir: str) -> str:
+    Validation: the byte count must match Content-Length when the server sends one, and
+    when the ETag is a plain MD5 digest (S3-style) the content hash must match it.
+    Peak memory stays at one chunk regardless of clip size.
+    """
+    import requests, hashlib, re, uuid
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    tmp = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.{uuid.uuid4().hex}.part")
+    md5 = hashlib.md5()
+    written = 0
+    try:
+        with requests.get(url, stream=True, timeout=(10, 60)) as r:
+            r.raise_for_status()
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    md5.update(chunk)
+                    written += len(chunk)
+            expected = r.headers.get("Content-Length")
+            # requests transparently decodes gzip; only compare lengths for identity-encoded bodies.
+            if expected and not r.headers.get("Content-Encoding") and int(expected) != written:
+                raise IOError(f"truncated download: got {written} of {expected} bytes")
+            etag = (r.headers.get("ETag") or "").strip('"')
+            if re.fullmatch(r"[0-9a-fA-F]{32}", etag) and etag.lower() != md5.hexdigest():
+                raise IOError("ETag checksum mismatch")
+        cached = _DOWNLOAD_CACHE.store(key, tmp, _download_suffix(url), move=True)
+        if not cached:
+            raise IOError("could not store download in cache")
+        return cached
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _download_if_remote(url: str, dest_dir: str | None = None) -> str:
+    """Return a local path for url, downloading it into the shared download cache on a miss.
+
+    Local paths are returned unchanged. Cached clips are shared across runs and LRU-evicted
+    above DOWNLOAD_CACHE_MAX_BYTES, so with dest_dir (the render's working directory) the
+    clip is hardlinked there and that path is returned; eviction can then never remove a
+    file a render is still reading. Without dest_dir the cache entry itself is returned.
+    """
     if not _is_url(url):
         return url
-    import requests, hashlib
-    os.makedirs(dest_dir, exist_ok=True)
-    fname = hashlib.md5(url.encode()).hexdigest() + ".mp4"
-    dest = os.path.join(dest_dir, fname)
-    if os.path.exists(dest):
+    import hashlib
+    key = hashlib.sha256(url.encode()).hexdigest()
+    suffix = _download_suffix(url)
+    with _download_locks[int(key[:8], 16) % _DOWNLOAD_LOCK_STRIPES]:
+        cached = _DOWNLOAD_CACHE.lookup(key, suffix)
+        if not cached:
+            try:
+                cached = _stream_download(url, key)
+            except Exception as e:
+                logging.warning("Failed to download %s: %s", url, e)
+                return url  # fall back to original
+        if dest_dir is None:
+            return cached
+        dest = os.path.join(dest_dir, f"download_{key[:16]}{suffix}")
+        # Scenes sharing a clip reuse the link rather than replacing it under a running ffmpeg.
+        if not os.path.exists(dest):
+            os.makedirs(dest_dir, exist_ok=True)
+            materialize(cached, dest)
         return dest
+
+def _prefetch_remote_media(scenes: list, dest_dir: str | None = None) -> None:
+    """Download every scene's remote clip concurrently so segment builds start from disk."""
+    urls = list(dict.fromkeys(s.get("video_url") for s in scenes if _is_url(s.get("video_url"))))
+    if not urls:
+        return
+    logging.info("Prefetching %d remote clips with %d workers", len(urls), min(DOWNLOAD_WORKERS, len(urls)))
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(urls)), thread_name_prefix="download") as pool:
+        list(pool.map(lambda url: _download_if_remote(url, dest_dir), urls))
+
+def _available_cores() -> int:
+    """CPUs this process may run on (affinity/cpuset aware), falling back to os.cpu_count()."""
     try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        with open(dest, "wb") as f: f.write(r.content)
-        return dest
-    except Exception as e:
-        logging.warning("Failed to download %s: %s", url, e)
-        return url  # fall back to original
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+def _segment_parallelism(segment_count: int) -> tuple[int, int]:
+    """Return (workers, threads_per_encode) for building `segment_count` segments.
+
+    Workers default to one per available core (RENDER_WORKERS overrides) and never exceed the
+    segment count; each libx264 encode is capped to its share of cores so concurrent
+    encodes don't oversubscribe the machine.
+    """
+    cores = _available_cores()
+    workers = RENDER_WORKERS or cores
+    workers = max(1, min(workers, segment_count))
+    threads = max(1, cores // workers)
+    return workers, threads
 
 def _merge_video_audio(video_path: str, audio_path: str, out_path: str, narration: str | None = None):
     # Basic ffmpeg merge; ignore narration text overlay for now to keep dependency surface minimal.
@@ -64,16 +183,44 @@ def _merge_video_audio(video_path: str, audio_path: str, out_path: str, narratio
         logging.warning("ffmpeg merge failed for %s + %s: %s", video_path, audio_path, e)
         return False
 
-def _concat_videos(video_paths: list, out_path: str):
+def _probe_stream_params(path: str) -> tuple | None:
+    """Return the codec/format parameters that must match for a stream-copy concat.
+
+    (video codec, width, height, frame rate, pix_fmt, audio codec, sample rate, channels),
+    or None when ffprobe is unavailable or the file lacks a video or audio stream.
+    """
+    info = media_probe.probe_media(path)
+    if not info or not info.get("video") or not info.get("audio"):
+        return None
+    video, audio = info["video"], info["audio"]
+    return (
+        video.get("codec"), video.get("width"), video.get("height"),
+        video.get("fps"), video.get("pix_fmt"),
+        audio.get("codec"), audio.get("sample_rate"), audio.get("channels"),
+    )
+
+def _segments_copy_compatible(video_paths: list) -> bool:
+    """True when every segment shares codec, resolution, fps and audio params (safe for -c copy)."""
+    params = [_probe_stream_params(p) for p in video_paths]
+    return bool(params) and params[0] is not None and all(p == params[0] for p in params)
+
+def _concat_videos(video_paths: list, out_path: str, stream_copy: bool = False):
+    """Concat via the concat demuxer; stream_copy remuxes without re-encoding (inputs must match)."""
     import subprocess, tempfile
     list_file = tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".txt")
     for p in video_paths:
-        list_file.write(f"file '{p}'\n")
+        list_file.write(f"file '{os.path.abspath(p)}'\n")
     list_file.flush()
+    if stream_copy:
+        codec_args = ["-c", "copy", "-movflags", "+faststart"]
+    else:
+        codec_args = [
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-r", "30",
+            "-c:a", "aac", "-ar", "44100", "-ac", "2",
+        ]
     cmd = [
         "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file.name,
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-r", "30",
-        "-c:a", "aac", "-ar", "44100", "-ac", "2",
+        *codec_args,
         out_path
     ]
     try:
@@ -115,40 +262,162 @@ def _reencode_uniform(video_paths: list, temp_dir: str) -> list:
             uniform_paths.append(src)
     return uniform_paths
 
-def _local_render(scenes: list, title: str) -> dict:
+def _scene_duration(scene: dict, fast_mode: bool) -> float:
+    """Scene length in seconds (capped at 4s in fast mode).
+
+    Uses the measured narration duration (audio_duration from the ffprobe pass) when known;
+    otherwise, e.g. for placeholder audio, the word-count heuristic (2.5 words/s, min 3s).
+    """
+    measured = scene.get("audio_duration")
+    if measured and not scene.get("audio_placeholder"):
+        base_duration = float(measured)
+    else:
+        words_per_second = 2.5
+        base_duration = max(len((scene.get("narration") or "").split()) / words_per_second, 3.0)
+    return min(base_duration, 4.0) if fast_mode else base_duration
+
+def _clip_input_args(scene: dict, duration: float, fast_mode: bool, target: tuple = (1280, 720)) -> list:
+    """Input-side options for a scene's clip: demuxer seek/trim plus cheap decode settings.
+
+    Seeking (-ss, from the scene's optional video_start, clamped to the source) and trimming
+    (-t) happen before decoding, so only the part of the clip the scene uses is decoded.
+    Clips shorter than the scene are looped instead. When the clip is downscaled by at least
+    2x the h264/hevc loop filter is skipped (its artifacts vanish in the downscale), and fast
+    mode also skips non-reference frames.
+    """
+    args = []
+    src_len = scene.get("video_duration")
+    start = max(0.0, float(scene.get("video_start") or 0))
+    if src_len and src_len < duration:
+        args += ["-stream_loop", "-1"]
+        start = 0.0
+    elif src_len:
+        start = min(start, src_len - duration)
+    if start > 0:
+        args += ["-ss", f"{start:.3f}"]
+    args += ["-t", f"{duration:.3f}"]
+    w, h = scene.get("video_width"), scene.get("video_height")
+    if w and h and min(target[0] / w, target[1] / h) <= 0.5:
+        args += ["-skip_loop_filter", "all"]
+    if fast_mode:
+        args += ["-skip_frame", "noref"]
+    return args
+
+def _probe_scenes(scenes: list, dest_dir: str | None = None) -> list:
+    """Copy scenes and fill in measured audio/video durations (one ffprobe pass, local files only).
+
+    Run after _prefetch_remote_media so remote clips resolve to their downloaded copies.
+    Assets from Stage 3 usually carry these already; this covers older checkpoints.
+    """
+    def local_path(path):
+        if not path:
+            return None
+        resolved = _download_if_remote(path, dest_dir)
+        return None if _is_url(resolved) else resolved
+    return media_probe.annotate_assets([dict(s) for s in scenes], resolve=local_path)
+
+def _usable_audio(scene: dict) -> str | None:
+    """Return the scene's narration path, or None when missing or a tiny placeholder (< 2KB)."""
+    audio_src = scene.get("audio_path") if scene.get("audio_path") else None
+    if audio_src and (not os.path.exists(audio_src) or os.path.getsize(audio_src) < 2048):
+        return None
+    return audio_src
+
+def _overlay_file(scene: dict, temp_dir: str) -> str | None:
+    """Write a synthetic scene's overlay_text (see Stage 3 _local_text_clip) to a file named after its hash.
+
+    Returns None when there is no text or ffmpeg lacks drawtext. A text file avoids
+    filter-string escaping; the segment cache keys it by content, not by this path.
+    """
+    import hashlib
+    text = scene.get("overlay_text")
+    if not text or not toolchain.has_filter("drawtext"):
+        return None
+    path = os.path.join(temp_dir, f"overlay_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}.txt")
+    if not os.path.exists(path):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return path
+
+def _overlay_filter(overlay_file: str | None) -> str | None:
+    """drawtext filter drawing the text in overlay_file (from _overlay_file), or None."""
+    if not overlay_file:
+        return None
+    return f"drawtext=textfile={overlay_file}:expansion=none:fontcolor=white:fontsize=48:x=(w-text_w)/2:y=(h-text_h)/2"
+
+def _segment_cache_key(cmd: list, inputs: dict, output_path: str, fast_mode: bool) -> str | None:
+    """Derive a content-addressed key for a segment encode, or None if it can't be cached.
+
+    The key covers the content hash of every input file, the full ffmpeg argument list
+    (duration, filters and encoder settings) with paths swapped for those hashes, and
+    fast_mode. Paths are swapped inside arguments too (e.g. drawtext textfile= in -vf), so
+    run-specific work dirs never leak into the key. -threads is dropped since it doesn't
+    change the output meaningfully.
+    """
+    import hashlib
+    if SEGMENT_CACHE_MAX_BYTES <= 0:
+        return None
+    try:
+        digests = {path: file_digest(path) for path in inputs.values() if path}
+    except OSError:
+        return None  # remote URL that failed to download, or a vanished file
+    parts = [f"fast_mode={fast_mode}"]
+    skip_next = False
+    for arg in cmd:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg == "-threads":
+            skip_next = True
+            continue
+        if arg == output_path:
+            parts.append("<out>")
+            continue
+        # Longest paths first so a path that prefixes another is never swapped partially.
+        for path in sorted(digests, key=len, reverse=True):
+            arg = arg.replace(path, digests[path])
+        parts.append(arg)
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+def _local_render(scenes: list, title: str, work_dir: str | None = None) -> dict:
     if not _local_ffmpeg_available():
         return {"error": "ffmpeg not available for local renderer"}
     if not scenes:
         return {"error": "No scenes provided for local render"}
     logging.info("Local renderer active: assembling %d scenes", len(scenes))
-    temp_dir = os.path.join("temp", "render_local")
-    os.makedirs(temp_dir, exist_ok=True)
+    temp_dir = _render_dir(work_dir)
     fast_mode = os.getenv("FAST_MODE", "").lower() in {"1", "true", "yes"}
     scene_iter = scenes[:3] if fast_mode else scenes
 
+    _prefetch_remote_media(scene_iter, temp_dir)
+    scene_iter = _probe_scenes(scene_iter, temp_dir)
+    workers, enc_threads = _segment_parallelism(len(scene_iter))
+
     def build_segment(idx: int, scene: dict) -> str | None:
         import subprocess, shutil
         video_src = _download_if_remote(scene["video_url"], temp_dir)
-        # Determine intended duration heuristic
-        words_per_second = 2.5
-        base_duration = max(len(scene.get("narration", "").split()) / words_per_second, 3.0)
-        duration = min(base_duration, 4.0) if fast_mode else base_duration
+        duration = _scene_duration(scene, fast_mode)
         segment_path = os.path.join(temp_dir, f"segment_{idx}.mp4")
-        audio_src = scene.get("audio_path") if scene.get("audio_path") else None
-        # Treat tiny placeholder audio (< 2KB) as invalid and replace with silence
-        if audio_src and (not os.path.exists(audio_src) or os.path.getsize(audio_src) < 2048):
-            audio_src = None
+        audio_src = _usable_audio(scene)
+        overlay_file = _overlay_file(scene, temp_dir)
+        overlay = _overlay_filter(overlay_file)
+        clip_args = _clip_input_args(scene, duration, fast_mode)
+        base_vf = "scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720:(ow-iw)/2:(oh-ih)/2:black"
+        vf = base_vf + (f",{overlay}" if overlay else "") + ",format=yuv420p"
         # Build ffmpeg command: always re-encode for uniformity
         if audio_src:
             cmd = [
                 "ffmpeg", "-y",
-                "-i", video_src,
+                *clip_args, "-i", video_src,
                 "-i", audio_src,
                 "-r", "30",
-                "-vf", "scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720:(ow-iw)/2:(oh-ih)/2:black,format=yuv420p",
+                "-vf", vf,
                 "-filter:a", "aresample=async=1",
                 "-t", f"{duration:.2f}",
                 "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+                "-threads", str(enc_threads),
                 "-pix_fmt", "yuv420p",
                 "-c:a", "aac", "-ar", "44100", "-ac", "2",
                 segment_path
@@ -157,31 +426,47 @@ def _local_render(scenes: list, title: str) -> dict:
             # Generate silent audio via anullsrc
             cmd = [
                 "ffmpeg", "-y",
-                "-i", video_src,
+                *clip_args, "-i", video_src,
                 "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
                 "-shortest",
                 "-r", "30",
-                "-vf", "scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720:(ow-iw)/2:(oh-ih)/2:black,format=yuv420p",
+                "-vf", vf,
                 "-filter:a", "aresample=async=1",
                 "-t", f"{duration:.2f}",
                 "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+                "-threads", str(enc_threads),
                 "-pix_fmt", "yuv420p",
                 "-c:a", "aac", "-ar", "44100", "-ac", "2",
                 segment_path
             ]
+        cache_key = _segment_cache_key(
+            cmd, {"video": video_src, "audio": audio_src, "overlay": overlay_file}, segment_path, fast_mode
+        )
+        if cache_key:
+            cached = _SEGMENT_CACHE.lookup(cache_key, ".mp4")
+            if cached:
+                logging.info("Segment cache hit idx=%d", idx)
+                return materialize(cached, segment_path)
+        # A previous run may have left segment_path hardlinked to a cache entry; unlink it so
+        # ffmpeg's truncate-and-write can't corrupt the cached copy.
+        if os.path.lexists(segment_path):
+            os.remove(segment_path)
         try:
             subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if cache_key:
+                _SEGMENT_CACHE.store(cache_key, segment_path, ".mp4")
             return segment_path
         except Exception as e:
             logging.warning("Segment build failed (video+audio) idx=%d: %s", idx, e)
             # Fallback: video only re-encode
             fallback_path = os.path.join(temp_dir, f"segment_{idx}_videoonly.mp4")
             cmd2 = [
-                "ffmpeg", "-y", "-i", video_src,
+                "ffmpeg", "-y", *clip_args, "-i", video_src,
                 "-t", f"{duration:.2f}",
                 "-r", "30",
-                "-vf", "scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720:(ow-iw)/2:(oh-ih)/2:black,format=yuv420p",
+                "-vf", base_vf + ",format=yuv420p",  # no overlay: drawtext may be what failed
                 "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+                "-threads", str(enc_threads),
                 "-pix_fmt", "yuv420p",
                 fallback_path
             ]
@@ -192,9 +477,16 @@ def _local_render(scenes: list, title: str) -> dict:
                 logging.error("Video-only fallback failed idx=%d: %s", idx, e2)
                 return None
 
+    # Each segment is an independent ffmpeg process, so a thread pool is enough to keep all cores busy.
+    logging.info("Building %d segments with %d workers (%d encoder threads each)", len(scene_iter), workers, enc_threads)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as pool:
+            built = list(pool.map(build_segment, range(len(scene_iter)), scene_iter))
+    else:
+        built = [build_segment(idx, scene) for idx, scene in enumerate(scene_iter)]
+
     segment_paths = []
-    for idx, scene in enumerate(scene_iter):
-        path = build_segment(idx, scene)
+    for idx, path in enumerate(built):
         if path:
             segment_paths.append(path)
         else:
@@ -214,8 +506,19 @@ def _local_render(scenes: list, title: str) -> dict:
         logging.info("Local render complete (single segment): %s", final_out)
         return {"final_video_url": final_out, "local": True}
 
-    # Concatenate uniformly encoded segments
-    ok = _concat_videos(segment_paths, final_out)
+    # Segments from build_segment share encode params, so a stream-copy concat usually suffices;
+    # only fall back to re-encoding when ffprobe finds a mismatch (e.g. a video-only fallback segment).
+    ok = False
+    if _segments_copy_compatible(segment_paths):
+        ok = _concat_videos(segment_paths, final_out, stream_copy=True)
+        if ok:
+            logging.info("Segments concatenated with stream copy (no re-encode)")
+        else:
+            logging.warning("Stream-copy concat failed; falling back to re-encoding concat")
+    else:
+        logging.info("Segments differ in codec/format parameters; concatenating with re-encode")
+    if not ok:
+        ok = _concat_videos(segment_paths, final_out)
     if not ok:
         logging.warning("Concat failed even after uniform encode; attempting second pass with re-encode")
         uniform_paths = _reencode_uniform(segment_paths, temp_dir)
@@ -229,6 +532,134 @@ def _local_render(scenes: list, title: str) -> dict:
     logging.info("Local render complete: %s", final_out)
     return {"final_video_url": final_out, "local": True}
 
+def _single_pass_filter(scene_inputs: list, width: int = 1280, height: int = 720) -> str:
+    """Build the filter_complex graph for _local_render_single_pass.
+
+    scene_inputs holds (video_input_idx, audio_input_idx | None, duration, overlay | None) per
+    scene. Each video is scaled/padded to width x height @30fps (plus the synthetic-clip text
+    overlay, if any), frozen on its last frame if too short and
+    trimmed to the scene length; narration is padded/trimmed to match (silence when absent),
+    then all scenes feed a single concat filter.
+    """
+    parts = []
+    labels = []
+    for i, (v_idx, a_idx, duration, overlay) in enumerate(scene_inputs):
+        d = f"{duration:.3f}"
+        parts.append(
+            f"[{v_idx}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,{overlay + ',' if overlay else ''}fps=30,format=yuv420p,setsar=1,"
+            f"tpad=stop_mode=clone:stop_duration={d},trim=duration={d},setpts=PTS-STARTPTS[v{i}]"
+        )
+        if a_idx is not None:
+            parts.append(
+                f"[{a_idx}:a]aresample=44100:async=1,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+                f"apad,atrim=duration={d},asetpts=PTS-STARTPTS[a{i}]"
+            )
+        else:
+            parts.append(f"anullsrc=r=44100:cl=stereo,atrim=duration={d},aformat=sample_fmts=fltp[a{i}]")
+        labels.append(f"[v{i}][a{i}]")
+    parts.append("".join(labels) + f"concat=n={len(scene_inputs)}:v=1:a=1[v][a]")
+    return ";".join(parts)
+
+def _single_pass_inputs(scene_iter: list, temp_dir: str, fast_mode: bool, width: int = 1280, height: int = 720) -> list:
+    """ffmpeg arguments for every scene input plus the filter_complex producing [v] and [a]."""
+    args = []
+    scene_inputs = []
+    input_idx = 0
+    for scene in scene_iter:
+        video_src = _download_if_remote(scene["video_url"], temp_dir)
+        duration = _scene_duration(scene, fast_mode)
+        # Input-side seek/trim: only the used part of each clip is demuxed and decoded.
+        args += [*_clip_input_args(scene, duration, fast_mode, (width, height)), "-i", video_src]
+        v_idx = input_idx
+        input_idx += 1
+        a_idx = None
+        audio_src = _usable_audio(scene)
+        if audio_src:
+            args += ["-i", audio_src]
+            a_idx = input_idx
+            input_idx += 1
+        scene_inputs.append((v_idx, a_idx, duration, _overlay_filter(_overlay_file(scene, temp_dir))))
+    return args + ["-filter_complex", _single_pass_filter(scene_inputs, width, height)]
+
+def _local_render_single_pass(scenes: list, title: str, work_dir: str | None = None) -> dict:
+    """Render all scenes with one ffmpeg invocation (RENDER_BACKEND=local_single_pass).
+
+    Trimming, scaling, padding and concatenation happen inside a single filter_complex
+    graph, so there is one decode/encode pass, no intermediate segment files and one
+    encoder warmup. Falls back to the segment-based _local_render if the graph fails.
+    """
+    import subprocess
+    if not _local_ffmpeg_available():
+        return {"error": "ffmpeg not available for local renderer"}
+    if not scenes:
+        return {"error": "No scenes provided for local render"}
+    temp_dir = _render_dir(work_dir)
+    fast_mode = os.getenv("FAST_MODE", "").lower() in {"1", "true", "yes"}
+    scene_iter = scenes[:3] if fast_mode else scenes
+    logging.info("Single-pass local renderer active: assembling %d scenes", len(scene_iter))
+    _prefetch_remote_media(scene_iter, temp_dir)
+    scene_iter = _probe_scenes(scene_iter, temp_dir)
+
+    final_out = os.path.join(temp_dir, "final_video.mp4")
+    cmd = [
+        "ffmpeg", "-y",
+        *_single_pass_inputs(scene_iter, temp_dir, fast_mode),
+        "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+        "-threads", str(_available_cores()),
+        "-pix_fmt", "yuv420p", "-r", "30",
+        "-c:a", "aac", "-ar", "44100", "-ac", "2",
+        "-movflags", "+faststart",
+        final_out
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        logging.warning("Single-pass render failed (%s); falling back to segment renderer", e)
+        return _local_render(scenes, title, work_dir)
+    logging.info("Local single-pass render complete: %s", final_out)
+    return {"final_video_url": final_out, "local": True, "single_pass": True}
+
+def render_preview(scenes: list, work_dir: str | None = None, name: str = "final_video") -> dict:
+    """Render a 640x360 ultrafast proxy of the timeline in one ffmpeg pass.
+
+    Uses the same assets, timing and overlays as the full render, so it is a faithful first
+    look that is ready within seconds. Written to temp/render_local/previews/<name>.mp4.
+    """
+    import subprocess
+    if not _local_ffmpeg_available():
+        return {"error": "ffmpeg not available for preview render"}
+    if not scenes:
+        return {"error": "No scenes provided for preview render"}
+    temp_dir = _render_dir(work_dir)
+    preview_dir = os.path.join("temp", "render_local", "previews")
+    os.makedirs(preview_dir, exist_ok=True)
+    fast_mode = os.getenv("FAST_MODE", "").lower() in {"1", "true", "yes"}
+    scene_iter = scenes[:3] if fast_mode else scenes
+    _prefetch_remote_media(scene_iter, temp_dir)
+    scene_iter = _probe_scenes(scene_iter, temp_dir)
+    preview_out = os.path.join(preview_dir, f"{name}.mp4")
+    cmd = [
+        "ffmpeg", "-y",
+        *_single_pass_inputs(scene_iter, temp_dir, fast_mode, PREVIEW_WIDTH, PREVIEW_HEIGHT),
+        "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "35",
+        "-threads", str(min(PREVIEW_THREADS, _available_cores())),
+        "-pix_fmt", "yuv420p", "-r", "30",
+        "-c:a", "aac", "-b:a", "64k", "-ar", "44100", "-ac", "2",
+        "-movflags", "+faststart",
+        preview_out
+    ]
+    started = time.monotonic()
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        logging.warning("Preview render failed: %s", e)
+        return {"error": f"Preview render failed: {e}"}
+    logging.info("Preview render complete in %.2fs: %s", time.monotonic() - started, preview_out)
+    return {"preview_url": preview_out, "local": True}
+
 def _is_url(path: str) -> bool:
     return isinstance(path, str) and (path.startswith("http://") or path.startswith("https://"))
 
@@ -261,17 +692,62 @@ def _concat_videos_filter(video_paths: list, out_path: str) -> bool:
         logging.warning("filter_complex concat failed: %s", e)
         return False
 
-def render_video(scenes: list, title: str) -> dict:
+def render_video(
+    scenes: list,
+    title: str,
+    on_preview: Callable[[dict], None] | None = None,
+    work_dir: str | None = None,
+    preview_name: str = "final_video",
+) -> dict:
+    """Render the final video with the configured RENDER_BACKEND.
+
+    With on_preview, a 360p proxy (render_preview, saved as previews/<preview_name>.mp4)
+    is rendered in a background thread alongside the full-quality render and passed to
+    on_preview as soon as it is ready, unless the full render already finished. The final
+    result then also carries preview_url. A failed preview never affects the full render.
+
+    Local renders write segments and final_video.mp4 under work_dir (default
+    temp/render_local); the pipeline passes each run its own directory.
+    """
+    preview: dict = {}
+    full_done = threading.Event()
+    preview_thread = None
+    if on_preview is not None:
+        def run_preview():
+            preview.update(render_preview(scenes, work_dir, preview_name))
+            # Once the full render is out, a preview notification would only be noise.
+            if preview.get("preview_url") and not full_done.is_set():
+                try:
+                    on_preview(preview)
+                except Exception as e:
+                    logging.warning("Preview callback failed: %s", e)
+        preview_thread = threading.Thread(target=run_preview, name="render-preview", daemon=True)
+        preview_thread.start()
+    try:
+        result = _render_full(scenes, title, work_dir)
+    finally:
+        full_done.set()
+    if preview_thread is not None:
+        preview_thread.join()
+    if preview.get("preview_url") and isinstance(result, dict) and not result.get("error"):
+        result["preview_url"] = preview["preview_url"]
+    return result
+
+def _render_full(scenes: list, title: str, work_dir: str | None = None) -> dict:
     fast_mode = os.getenv("FAST_MODE", "").lower() in {"1", "true", "yes"}
     if RENDER_BACKEND == "local":
         print("--- Stage 4: Renderer (Using Local FFmpeg) ---")
         logging.info("Local renderer selected | fast_mode=%s", fast_mode)
-        return _local_render(scenes, title)
+        return _local_render(scenes, title, work_dir)
+    if RENDER_BACKEND == "local_single_pass":
+        print("--- Stage 4: Renderer (Using Local FFmpeg, single pass) ---")
+        logging.info("Local single-pass renderer selected | fast_mode=%s", fast_mode)
+        return _local_render_single_pass(scenes, title, work_dir)
     print("--- Stage 4: Renderer (Using Shotstack) ---")
     logging.info("Shotstack environment: %s | fast_mode=%s", SHOTSTACK_STAGE, fast_mode)
     if DEV_FALLBACK_MODE:
         logging.warning("Dev fallback active for Stage 4 — using local renderer stub.")
-        return _local_render(scenes, title)
+        return _local_render(scenes, title, work_dir)
     configuration = shotstack_sdk.Configuration(host="https://api.shotstack.io/" + SHOTSTACK_STAGE)
     with shotstack_sdk.ApiClient(configuration) as api_client:
         api_client.set_default_header('x-api-key', SHOTSTACK_API_KEY)
@@ -281,9 +757,7 @@ def render_video(scenes: list, title: str) -> dict:
         # Optionally limit scenes and reduce duration in fast mode (sandbox credit-friendly)
         scene_iter = scenes[:3] if fast_mode else scenes
         for scene in scene_iter:
-            words_per_second = 2.5
-            base_duration = max(len(scene["narration"].split()) / words_per_second, 3.0)
-            duration = min(base_duration, 4.0) if fast_mode else base_duration
+            duration = _scene_duration(scene, fast_mode)
             video_clips.append(Clip(asset=VideoAsset(src=scene["video_url"], volume=0.0), start=start_time, length=duration))
             audio_src = scene.get("audio_path")
             if _is_url(audio_src):
@@ -1,6 +1,8 @@
 import argparse
+import json
 import logging
-from app.services.pipeline_runner import run_pipeline
+from app.services.pipeline_runner import run_pipeline, resume
+from app.stages.stage_1_idea_engine import generate_video_ideas
 
 
 def configure_logging(verbose: bool = False):
@@ -12,11 +14,33 @@ def cli():
     parser = argparse.ArgumentParser(description="Run pipeline (CLI)")
     parser.add_argument("--niche", type=str, default="Stoicism", help="Single-word niche, e.g., 'Stoicism'")
     parser.add_argument("--upload", action="store_true", help="Upload to YouTube after rendering")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the cached idea for this niche and generate a new one")
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose logging")
+    parser.add_argument("--resume", type=str, metavar="RUN_ID", help="Resume a previous run from its checkpoints")
+    parser.add_argument(
+        "--from-stage",
+        type=str,
+        choices=["idea", "script", "assets", "render", "upload"],
+        help="Stage to re-execute from when resuming (default: first stage without a checkpoint)",
+    )
+    parser.add_argument(
+        "--batch-ideas",
+        nargs="+",
+        metavar="NICHE",
+        help="Only generate ideas for these niches (batched Gemini requests), print them as JSON and exit",
+    )
     args = parser.parse_args()
 
     configure_logging(args.verbose)
-    result = run_pipeline(args.niche, upload=args.upload)
+    if args.batch_ideas:
+        ideas = generate_video_ideas(args.batch_ideas, fresh=args.fresh)
+        print(json.dumps([{"niche": n, "idea": i} for n, i in zip(args.batch_ideas, ideas)], indent=2))
+        return
+    if args.resume:
+        result = resume(args.resume, from_stage=args.from_stage, upload=args.upload or None)
+    else:
+        result = run_pipeline(args.niche, upload=args.upload, fresh_idea=args.fresh)
+    print(f"Run ID: {result.get('run_id')}")
     if result.get("error"):
         logging.error("Pipeline failed: %s", result["error"]) 
         raise SystemExit(1)
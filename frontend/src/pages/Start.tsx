@@ -3,6 +3,9 @@ import { Input, Label } from '../components/ui/Form'
 import ProgressBar from '../components/ui/ProgressBar'
 import { apiUrl } from '../lib/api'
 
+// Give up polling a queued pipeline job after this long and show an error instead.
+const MAX_JOB_WAIT_MS = 30 * 60 * 1000
+
 export default function Start() {
   // Do not hardcode a default niche — start empty so user can provide their own topic
   const [niche, setNiche] = useState('')
@@ -10,6 +13,8 @@ export default function Start() {
   const [verbose, setVerbose] = useState(false)
   const [result, setResult] = useState<any>(null)
   const [videoUrl, setVideoUrl] = useState<string | null>(null)
+  // Low-res proxy (RENDER_PREVIEW) shown while the full-quality render is still running
+  const [previewUrl, setPreviewUrl] = useState<string | null>(null)
   const [loading, setLoading] = useState(false)
   const [progress, setProgress] = useState(0)
   const [suggesting, setSuggesting] = useState(false)
@@ -25,6 +30,8 @@ export default function Start() {
   const start = async () => {
     setLoading(true)
     setResult(null)
+    setVideoUrl(null)
+    setPreviewUrl(null)
     setProgress(5)
     setScript(null)
     setAssets(null)
@@ -34,7 +41,30 @@ export default function Start() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ niche, upload, verbose }),
       })
-      const data = await res.json()
+      const queued = await res.json()
+      if (!res.ok || !queued.job_id) {
+        throw new Error(queued.detail || `Pipeline request failed with status ${res.status}`)
+      }
+      // The backend queues the run; poll the job until it finishes.
+      const stageProgress: Record<string, number> = { idea: 15, script: 30, assets: 50, render: 70, upload: 85 }
+      let job: any = null
+      const deadline = Date.now() + MAX_JOB_WAIT_MS
+      while (true) {
+        await new Promise(r => setTimeout(r, 2000))
+        if (Date.now() > deadline) {
+          throw new Error(`Job ${queued.job_id} did not finish within ${MAX_JOB_WAIT_MS / 60000} minutes`)
+        }
+        const jr = await fetch(apiUrl(`/api/jobs/${queued.job_id}`))
+        if (!jr.ok) {
+          const detail = await jr.json().then(b => b.detail, () => null)
+          throw new Error(detail || `Job status request failed with status ${jr.status}`)
+        }
+        job = await jr.json()
+        if (job.status === 'done' || job.status === 'failed') break
+        if (job.stage && stageProgress[job.stage]) setProgress(stageProgress[job.stage])
+        if (job.preview_url) setPreviewUrl(job.preview_url.startsWith('http') ? job.preview_url : apiUrl(job.preview_url))
+      }
+      const data = { ...(job.result || {}), job_id: queued.job_id, error: job.error || job.result?.error || null }
       setProgress(90)
       setResult(data)
       if (data.script && Array.isArray(data.script.scenes)) {
@@ -46,8 +76,10 @@ export default function Start() {
       if (Array.isArray(data.assets)) {
         setAssets(data.assets)
       }
-      // Derive playable video URL
-      if (data.final_video_url) {
+      // Derive playable video URL (local renders are archived to the library under a unique name)
+      if (data.library_url) {
+        setVideoUrl(apiUrl(data.library_url))
+      } else if (data.final_video_url) {
         if (data.final_video_url.startsWith('http')) {
           setVideoUrl(data.final_video_url)
         } else {
@@ -214,6 +246,16 @@ export default function Start() {
               className="w-full rounded-lg border border-white/10 bg-black"
               src={videoUrl}
             />
+          ) : previewUrl ? (
+            <div>
+              <video
+                key={previewUrl}
+                controls
+                className="w-full rounded-lg border border-white/10 bg-black"
+                src={previewUrl}
+              />
+              <p className="mt-1 text-[11px] text-muted">Preview (360p) — full-quality render in progress…</p>
+            </div>
           ) : (
             <p className="text-xs text-muted">No video yet.</p>
           )}
@@ -4,6 +4,7 @@ import { apiUrl } from '../lib/api'
 type LibraryVideo = {
   filename: string
   url: string
+  preview_url?: string | null // 360p proxy, when rendered with RENDER_PREVIEW
   size: number
   mtime: number
 }
@@ -24,6 +25,7 @@ export default function VideoLibrary() {
       const list: LibraryVideo[] = (data.videos || []).map((v: LibraryVideo) => ({
         ...v,
         url: v.url?.startsWith('http') ? v.url : apiUrl(v.url),
+        preview_url: v.preview_url ? apiUrl(v.preview_url) : null,
       }))
       setVideos(list)
     } catch (e: any) {
@@ -53,7 +55,7 @@ export default function VideoLibrary() {
             <div key={v.filename} className="card p-0 overflow-hidden group">
               <div className="relative aspect-video bg-white/5">
                 {/* Use an inline video poster-less preview; show controls on hover */}
-                <video src={v.url} className="w-full h-full object-cover" muted playsInline/>
+                <video src={v.preview_url || v.url} className="w-full h-full object-cover" muted playsInline/>
                 <div className="absolute inset-0 opacity-0 group-hover:opacity-100 transition-opacity bg-black/40 flex items-center justify-center gap-2">
                   <button className="btn-primary" onClick={() => setPreviewUrl(v.url)}>Preview</button>
                   <a className="btn-secondary" href={v.url} download>Download</a>
@@ -0,0 +1,69 @@
+"""Local stand-in for the ElevenLabs text-to-speech API.
+
+Serves both endpoints Stage 3 uses so batched TTS (TTS_BATCH=1) can be exercised
+offline:
+    POST /v1/text-to-speech/{voice_id}                  -> audio/mpeg
+    POST /v1/text-to-speech/{voice_id}/with-timestamps  -> {audio_base64, alignment}
+
+Audio is a sine tone whose length follows the text (CHARS_PER_SECOND), generated with
+ffmpeg; alignment spreads characters evenly over it.
+
+Usage:
+    python scripts/mock_elevenlabs.py --port 8765
+    export ELEVENLABS_API_BASE=http://127.0.0.1:8765 ELEVENLABS_API_KEY=mock TTS_BATCH=1
+"""
+import argparse
+import base64
+import json
+import subprocess
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_SECOND = 15.0
+
+
+def synth_tone(seconds: float) -> bytes:
+    with tempfile.NamedTemporaryFile(suffix=".mp3") as tmp:
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds:.3f}",
+            "-c:a", "libmp3lame", "-q:a", "6", tmp.name,
+        ], check=True)
+        with open(tmp.name, "rb") as f:
+            return f.read()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        text = body.get("text", "")
+        seconds = max(len(text) / CHARS_PER_SECOND, 0.5)
+        audio = synth_tone(seconds)
+        if self.path.rstrip("/").endswith("/with-timestamps"):
+            per_char = seconds / max(len(text), 1)
+            payload = json.dumps({
+                "audio_base64": base64.b64encode(audio).decode(),
+                "alignment": {
+                    "characters": list(text),
+                    "character_start_times_seconds": [round(i * per_char, 3) for i in range(len(text))],
+                    "character_end_times_seconds": [round((i + 1) * per_char, 3) for i in range(len(text))],
+                },
+            }).encode()
+            self._send(200, "application/json", payload)
+        else:
+            self._send(200, "audio/mpeg", audio)
+
+    def _send(self, status: int, content_type: str, data: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock ElevenLabs TTS server")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    print(f"[mock-elevenlabs] listening on http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), Handler).serve_forever()
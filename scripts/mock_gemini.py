@@ -0,0 +1,108 @@
+"""Local stand-in for the Gemini generateContent / streamGenerateContent API.
+
+Lets streaming Stage 2 (SCRIPT_STREAMING=1) be exercised offline:
+    POST .../models/{model}:generateContent                  -> full response after every scene is "written"
+    POST .../models/{model}:streamGenerateContent?alt=sse    -> server-sent events, small text chunks
+
+Scripts have SCENES scenes and each one takes SCENE_DELAY seconds to "generate", so the
+streaming endpoint emits scene 1 long before the last one. Prompts without "scenes" get a
+Stage 1 idea instead. Narration carries curly quotes and an emoji, and the event stream is
+raw UTF-8 without a charset (like the real API), so clients must decode it as UTF-8.
+
+Usage:
+    python scripts/mock_gemini.py --port 8766
+    export GEMINI_API_BASE=http://127.0.0.1:8766/v1beta GEMINI_API_KEY=mock SCRIPT_STREAMING=1
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCENES = 6
+SCENE_DELAY = 1.0
+CHUNK_CHARS = 24
+
+
+def script_text() -> str:
+    scenes = [
+        {"visual": f"Cinematic shot {i + 1}: city skyline at dusk", "narration": f"Scene {i + 1}: don\u2019t scroll \u2014 \u201cthis\u201d keeps viewers hooked \U0001F3AC"}
+        for i in range(SCENES)
+    ]
+    return json.dumps({"scenes": scenes}, separators=(",", ":"), ensure_ascii=False)
+
+
+def idea_text() -> str:
+    return json.dumps({
+        "title": "Mock Idea",
+        "hook": "You won't believe this mock hook.",
+        "description": "A mock idea for offline runs. #mock #test #offline",
+        "points": ["First point", "Second point", "Third point"],
+        "cta": "Follow for more mocks!",
+    })
+
+
+def chunks(text: str):
+    """Split the answer so each scene's text arrives over SCENE_DELAY seconds."""
+    boundaries = [i + 1 for i, c in enumerate(text) if c == "}"] if "scenes" in text else [len(text)]
+    start = 0
+    for end in boundaries:
+        piece = text[start:end]
+        parts = [piece[i:i + CHUNK_CHARS] for i in range(0, len(piece), CHUNK_CHARS)] or [""]
+        for part in parts:
+            time.sleep(SCENE_DELAY / len(parts))
+            yield part
+        start = end
+    if start < len(text):
+        yield text[start:]
+
+
+def response_event(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the stream can use chunked transfer encoding, as the real API does.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *a):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        text = script_text() if '"scenes"' in prompt else idea_text()
+        path = self.path.split("?", 1)[0]
+        if path.endswith(":streamGenerateContent"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in chunks(text):
+                event = f"data: {json.dumps(response_event(part), ensure_ascii=False)}\r\n\r\n".encode("utf-8")
+                self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        elif path.endswith(":generateContent"):
+            for _ in chunks(text):
+                pass
+            data = json.dumps(response_event(text)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Gemini server (generateContent + streamGenerateContent)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--scenes", type=int, default=SCENES)
+    parser.add_argument("--scene-delay", type=float, default=SCENE_DELAY, help="Seconds to 'generate' each scene")
+    args = parser.parse_args()
+    SCENES, SCENE_DELAY = args.scenes, args.scene_delay
+    print(f"[mock-gemini] listening on http://127.0.0.1:{args.port} ({SCENES} scenes, {SCENE_DELAY}s each)")
+    ThreadingHTTPServer(("127.0.0.1", args.port), Handler).serve_forever()
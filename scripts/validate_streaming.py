@@ -0,0 +1,115 @@
+"""Compare sequential vs streaming Stage 2 -> Stage 3 against local mock servers.
+
+Starts mock Gemini (scripts/mock_gemini.py), mock ElevenLabs (scripts/mock_elevenlabs.py)
+and a minimal single-GPU SVD server in-process, then runs Stage 2 + Stage 3 twice:
+    sequential: run_scriptwriter, then generate_media_assets
+    streaming:  stream_script_scenes feeding generate_media_assets_stream (SCRIPT_STREAMING=1)
+
+Usage:
+    python scripts/validate_streaming.py --scenes 6 --scene-delay 1.0 --video-seconds 2.0
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append('backend')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description='Validate streaming script generation (SCRIPT_STREAMING=1)')
+parser.add_argument('--scenes', type=int, default=6, help='Scenes the mock model writes')
+parser.add_argument('--scene-delay', type=float, default=1.0, help='Seconds the mock model spends per scene')
+parser.add_argument('--video-seconds', type=float, default=2.0, help='Seconds each mock SVD job takes')
+args = parser.parse_args()
+
+import mock_gemini
+import mock_elevenlabs
+
+mock_gemini.SCENES, mock_gemini.SCENE_DELAY = args.scenes, args.scene_delay
+
+
+class MockSVDHandler(BaseHTTPRequestHandler):
+    """Single-GPU SVD server: jobs run one after another, args.video_seconds each."""
+    jobs = {}
+    lock = threading.Lock()
+    busy_until = 0.0
+
+    def log_message(self, *a):
+        pass
+
+    def _json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            job_id = f'job{len(self.jobs) + 1}'
+            MockSVDHandler.busy_until = max(time.monotonic(), MockSVDHandler.busy_until) + args.video_seconds
+            self.jobs[job_id] = MockSVDHandler.busy_until
+        self._json({'id': job_id})
+
+    def do_GET(self):
+        job_id = self.path.rsplit('/', 1)[-1]
+        if time.monotonic() < self.jobs.get(job_id, 0):
+            return self._json({'status': 'processing'})
+        self._json({'status': 'completed', 'url': f'http://127.0.0.1:{self.server.server_address[1]}/clips/{job_id}.mp4'})
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+os.environ['GEMINI_API_BASE'] = serve(mock_gemini.Handler) + '/v1beta'
+os.environ['ELEVENLABS_API_BASE'] = serve(mock_elevenlabs.Handler)
+os.environ['STABLE_VIDEO_SERVER_URL'] = serve(MockSVDHandler)
+os.environ.update({
+    'GEMINI_API_KEY': 'mock', 'ELEVENLABS_API_KEY': 'mock', 'PEXELS_API_KEY': 'mock',
+    'MEDIA_SOURCE': 'svd', 'RENDER_BACKEND': 'local', 'TTS_SOURCE': 'elevenlabs',
+    'STABLE_VIDEO_POLL_INTERVAL': '0.1', 'SVD_POLL_MAX_INTERVAL': '0.5', 'SVD_JOB_TIMEOUT': '120',
+    'TTS_CACHE_MAX_BYTES': '0',
+})
+
+from app.stages.stage_2_scriptwriter import run_scriptwriter, stream_script_scenes
+from app.stages.stage_3_media_engine import generate_media_assets, generate_media_assets_stream
+
+idea = {'title': 'Mock Idea', 'hook': 'Mock hook', 'points': ['One', 'Two', 'Three'], 'cta': 'Follow'}
+
+print(f"[validate] Sequential: full script ({args.scenes} scenes x {args.scene_delay}s), then Stage 3")
+t0 = time.monotonic()
+script = run_scriptwriter(idea)
+script_done = time.monotonic() - t0
+assets = generate_media_assets(script)
+sequential = time.monotonic() - t0
+print(f"[validate]   script {script_done:.2f}s, total {sequential:.2f}s, assets {len(assets)}")
+
+print('[validate] Streaming: Stage 3 starts on each scene as it arrives')
+t0 = time.monotonic()
+first_scene = []
+
+
+def timed_scenes():
+    for scene in stream_script_scenes(idea):
+        if not first_scene:
+            first_scene.append(time.monotonic() - t0)
+        yield scene
+
+
+scenes, assets = generate_media_assets_stream(timed_scenes())
+streaming = time.monotonic() - t0
+print(f"[validate]   first scene {first_scene[0] if first_scene else float('nan'):.2f}s, total {streaming:.2f}s, "
+      f"scenes {len(scenes)}, assets {len(assets)}")
+print(f"[validate] Streaming saved {sequential - streaming:.2f}s ({(1 - streaming / sequential) * 100:.0f}%)")
+# The mock narration is non-ASCII; both paths must hand Stage 3 exactly the same text.
+same_text = [s.get('narration') for s in scenes] == [s.get('narration') for s in script.get('scenes', [])]
+print(f"[validate] Streamed narration matches sequential: {same_text}")
+sys.exit(0 if len(assets) == args.scenes and same_text else 1)
@@ -1,11 +1,125 @@
-import os, sys, json, pathlib, time
+import os, sys, json, pathlib, time, argparse, random, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 sys.path.append('backend')
+
+parser = argparse.ArgumentParser(description='Validate the MEDIA_SOURCE=svd pipeline path')
+parser.add_argument('--mock', action='store_true', help='Run Stage 3 only against a local mock SVD server and report timing')
+parser.add_argument('--scenes', type=int, default=6, help='Scenes to generate in --mock mode')
+parser.add_argument('--min-seconds', type=float, default=2.0, help='Shortest mock job duration')
+parser.add_argument('--max-seconds', type=float, default=6.0, help='Longest mock job duration')
+parser.add_argument('--webhook', action='store_true', help='Have the mock server POST completions to a callback URL')
+args = parser.parse_args()
+
+
+class MockSVDHandler(BaseHTTPRequestHandler):
+    """Minimal SVD server: every job completes after a random duration."""
+    jobs = {}
+    lock = threading.Lock()
+    rng = random.Random(7)
+
+    def log_message(self, *a):
+        pass
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _clip_url(self, job_id):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/clips/{job_id}.mp4'
+
+    def do_POST(self):
+        if self.path != '/generate':
+            return self._json(404, {'error': 'not found'})
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.lock:
+            job_id = f'job{len(self.jobs) + 1}'
+            duration = self.rng.uniform(args.min_seconds, args.max_seconds)
+            self.jobs[job_id] = {'ready_at': time.monotonic() + duration, 'duration': duration}
+        callback = body.get('callback_url')
+        if callback:
+            import requests
+            payload = {'id': job_id, 'status': 'completed', 'url': self._clip_url(job_id)}
+            threading.Timer(duration, lambda: requests.post(callback, json=payload, timeout=5)).start()
+        self._json(200, {'id': job_id})
+
+    def do_GET(self):
+        if not self.path.startswith('/status/'):
+            return self._json(404, {'error': 'not found'})
+        job_id = self.path.rsplit('/', 1)[-1]
+        with self.lock:
+            job = self.jobs.get(job_id)
+            self.server.status_requests = getattr(self.server, 'status_requests', 0) + 1
+        if job is None:
+            return self._json(404, {'error': 'unknown job'})
+        if time.monotonic() < job['ready_at']:
+            return self._json(200, {'status': 'processing'})
+        self._json(200, {'status': 'completed', 'url': self._clip_url(job_id)})
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if args.mock:
+    mock = serve(MockSVDHandler)
+    os.environ['STABLE_VIDEO_SERVER_URL'] = f'http://127.0.0.1:{mock.server_address[1]}'
+    os.environ.setdefault('STABLE_VIDEO_POLL_INTERVAL', '0.25')
+    os.environ.setdefault('SVD_POLL_MAX_INTERVAL', '2')
+    # Non-dev keys so Stage 3 actually talks to the (mock) SVD server.
+    os.environ.setdefault('PEXELS_API_KEY', 'mock')
+    os.environ.setdefault('ELEVENLABS_API_KEY', 'mock')
+    callback_server = None
+    if args.webhook:
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def do_POST(self):
+                from urllib.parse import parse_qs, urlsplit
+                from app.services.svd_client import get_svd_client
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                token = parse_qs(urlsplit(self.path).query).get('token', [''])[0]
+                try:
+                    get_svd_client().complete(body.get('id'), body, token)
+                except PermissionError as e:
+                    print(f'[validate] Callback rejected: {e}')
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                self.send_response(204)
+                self.end_headers()
+
+        callback_server = serve(CallbackHandler)
+        os.environ['SVD_CALLBACK_URL'] = f'http://127.0.0.1:{callback_server.server_address[1]}/svd/callback'
+
 # Set env vars for test run
 os.environ['MEDIA_SOURCE'] = 'svd'
 os.environ['FAST_MODE'] = '1'
 os.environ['RENDER_BACKEND'] = 'local'
 os.environ['TTS_SOURCE'] = 'local'
 os.environ.setdefault('GEMINI_MODEL','gemini-2.5-flash')
+
+if args.mock:
+    from app.stages.stage_3_media_engine import generate_media_assets
+    script = {'scenes': [{'visual': f'mock scene {i + 1}', 'narration': ''} for i in range(args.scenes)]}
+    print(f"[validate] Stage 3 against mock SVD server: {args.scenes} scenes, jobs {args.min_seconds}-{args.max_seconds}s"
+          f"{' (webhook)' if args.webhook else ''}")
+    t0 = time.monotonic()
+    assets = generate_media_assets(script)
+    elapsed = time.monotonic() - t0
+    durations = [j['duration'] for j in MockSVDHandler.jobs.values()]
+    ok = sum(1 for a in assets if '/clips/' in (a.get('video_url') or ''))
+    print(f"[validate] Clips from mock server: {ok}/{args.scenes}")
+    print(f"[validate] Stage 3 wall time: {elapsed:.2f}s (slowest job {max(durations):.2f}s, sequential sum {sum(durations):.2f}s)")
+    print(f"[validate] Status requests: {getattr(mock, 'status_requests', 0)}")
+    sys.exit(0 if ok == args.scenes else 1)
+
 from app.services.pipeline_runner import run_pipeline
 
 print('[validate] Starting pipeline with MEDIA_SOURCE=svd FAST_MODE=1 RENDER_BACKEND=local TTS_SOURCE=local')